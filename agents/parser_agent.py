@@ -1,5 +1,6 @@
 import json
-from typing import Dict, List
+import re
+from typing import Dict, List, Optional
 from utils.llm import chat_completion, parse_json_response
 
 PARSER_SYSTEM = """You are a math problem parser for JEE-level problems.
@@ -28,13 +29,33 @@ class ParserAgent:
     def __init__(self, correction_patterns: List[Dict] = None):
         self.correction_patterns = correction_patterns or []
 
-    def _apply_correction_patterns(self, text: str) -> str:
-        for pattern in self.correction_patterns:
+    @property
+    def correction_patterns(self) -> List[Dict]:
+        return self._correction_patterns
+
+    # All corrections are compiled into one alternation, longest original first,
+    # so a single left-to-right pass applies them. At any position the longest
+    # matching original wins; for duplicate originals the latest pattern wins.
+    # Replaced text is never rescanned.
+    @correction_patterns.setter
+    def correction_patterns(self, patterns: List[Dict]):
+        self._correction_patterns = patterns
+        table = {}
+        for pattern in patterns:
             original = pattern.get("original", "")
             correction = pattern.get("correction", "")
-            if original and correction and original in text:
-                text = text.replace(original, correction)
-        return text
+            if original and correction:
+                table[original] = correction
+        self._corrections = table
+        self._correction_regex: Optional[re.Pattern] = None
+        if table:
+            originals = sorted(table, key=lambda o: (-len(o), o))
+            self._correction_regex = re.compile("|".join(map(re.escape, originals)))
+
+    def _apply_correction_patterns(self, text: str) -> str:
+        if self._correction_regex is None:
+            return text
+        return self._correction_regex.sub(lambda m: self._corrections[m.group(0)], text)
 
     def parse(self, raw_text: str, input_type: str = "text") -> Dict:
         corrected_text = self._apply_correction_patterns(raw_text)
@@ -1,5 +1,3 @@
-import sympy
-from sympy import symbols, solve, diff, integrate, limit, simplify, latex
 from typing import Dict, List, Tuple, Optional
 from utils.llm import chat_completion, parse_json_response
 
@@ -31,6 +29,8 @@ class SolverAgent:
             topic = parsed.get("topic", "")
             if topic == "algebra":
                 import re
+                import sympy
+                from sympy import symbols, solve
                 eq_match = re.search(r"([\w\s\+\-\*\/\^\=]+)\s*=\s*([\w\s\+\-\*\/\^]+)", problem_text)
                 if eq_match:
                     x = symbols("x")
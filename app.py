@@ -1,17 +1,18 @@
 import os
 import sys
 import json
-import tempfile
 import time
-from pathlib import Path
 
 import streamlit as st
 
 sys.path.insert(0, os.path.dirname(__file__))
 
+from config import MEMORY_SIMILARITY
 from orchestrator import Orchestrator
-from utils.ocr import extract_text_from_image
+from utils.ocr import extract_problems_from_image, extract_text_from_image, ocr_engine_stats
 from utils.audio import transcribe_audio
+from utils.cache import content_key
+from utils.warmup import get_warmup_manager
 
 st.set_page_config(
     page_title="Math Mentor — JEE AI Tutor",
@@ -37,7 +38,14 @@ st.markdown(_CSS, unsafe_allow_html=True)
 
 @st.cache_resource(show_spinner="Loading AI agents...")
 def get_orchestrator():
-    return Orchestrator()
+    manager = get_warmup_manager().start()
+    orc = Orchestrator()
+    manager.add(
+        "memory_index", "Memory index", orc.memory.build_vector_index,
+        f"MEMORY_SIMILARITY={MEMORY_SIMILARITY}" if MEMORY_SIMILARITY in ("lexical", "minhash") else "",
+    )
+    manager.start()
+    return orc
 
 
 def confidence_badge(conf: float) -> str:
@@ -56,10 +64,29 @@ def render_sidebar(orc: Orchestrator):
     st.sidebar.metric("Marked Incorrect ❌", stats["incorrect"])
     st.sidebar.divider()
     with st.sidebar.expander("📚 Rebuild Knowledge Index"):
-        if st.button("Rebuild Vector Index"):
-            with st.spinner("Rebuilding..."):
-                orc.rag.rebuild_index()
-            st.success("Index rebuilt!")
+        status = orc.rag.rebuild_status
+        running = status["state"] == "running"
+        if st.button("Rebuild Vector Index", disabled=running):
+            orc.rag.rebuild_index_async()
+            status = orc.rag.rebuild_status
+            running = True
+        if running:
+            st.progress(status["pct"], text=status["message"])
+            st.button("Refresh status")
+        elif status["state"] == "done":
+            st.success(f"Index rebuilt! Serving version {status['version']}")
+        elif status["state"] == "failed":
+            st.error(f"Rebuild failed: {status['error']}")
+        st.caption(f"Index version: {orc.rag.version or 'none'}")
+    render_model_status()
+    engine_stats = ocr_engine_stats()
+    if engine_stats:
+        with st.sidebar.expander("🔎 OCR Engines"):
+            for name, es in engine_stats.items():
+                st.caption(
+                    f"**{name}** · {es['runs']} runs · {es['mean_ms']:.0f} ms avg · "
+                    f"picked {es['win_rate']:.0%}"
+                )
     with st.sidebar.expander("🗃️ Recent Memory"):
         records = orc.memory.get_all_records()[-5:][::-1]
         if not records:
@@ -73,6 +100,23 @@ def render_sidebar(orc: Orchestrator):
     st.sidebar.caption("Built with OpenAI GPT-4o · FAISS · Streamlit")
 
 
+def render_model_status():
+    status = get_warmup_manager().status()
+    if not status:
+        return
+    icons = {"ready": "🟢", "loading": "🟡", "waiting": "🟡", "failed": "🔴", "off": "⚪"}
+    loading = any(s["state"] in ("loading", "waiting") for s in status.values())
+    with st.sidebar.expander("⏳ Models", expanded=loading):
+        for s in status.values():
+            detail = f"{s['seconds']:.1f} s" if s["state"] == "ready" else s["state"]
+            if s["error"]:
+                detail += f" · {s['error'][:80]}"
+            st.caption(f"{icons[s['state']]} **{s['label']}** · {detail}")
+        if loading:
+            st.caption("Requests run meanwhile, using the models that are ready.")
+            st.button("Refresh status", key="refresh_models")
+
+
 def render_input_section():
     st.header("📥 Submit a Math Problem")
     mode = st.radio(
@@ -96,19 +140,30 @@ def handle_text_input():
 
 def handle_image_input():
     uploaded = st.file_uploader("Upload image (JPG/PNG)", type=["jpg", "jpeg", "png"], key="img_upload")
+    whole_page = st.checkbox("Page with several numbered problems", key="whole_page")
+    st.session_state["page_problems"] = []
     if uploaded is None:
         return "", 0.0, False, None
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=Path(uploaded.name).suffix) as tmp:
-        tmp.write(uploaded.read())
-        tmp_path = tmp.name
+    image_bytes = uploaded.getvalue()
+    # A new file drops the previous worksheet's results and edited problems.
+    upload_key = content_key(image_bytes)
+    if st.session_state.get("page_upload") != upload_key:
+        st.session_state["page_upload"] = upload_key
+        st.session_state["batch_results"] = None
+        for key in [k for k in st.session_state if str(k).startswith("page_problem_")]:
+            del st.session_state[key]
 
     col1, col2 = st.columns([1, 1])
     with col1:
-        st.image(tmp_path, caption="Uploaded Image", use_container_width=True)
+        st.image(image_bytes, caption="Uploaded Image", use_container_width=True)
+    if whole_page:
+        with col2:
+            handle_page_problems(image_bytes)
+        return "", 0.0, False, image_bytes
     with col2:
         with st.spinner("Running OCR..."):
-            extracted, conf, needs_hitl = extract_text_from_image(tmp_path)
+            extracted, conf, needs_hitl = extract_text_from_image(image_bytes)
 
         st.markdown(f"**OCR Confidence:** {confidence_badge(conf)}", unsafe_allow_html=True)
         if needs_hitl:
@@ -116,7 +171,22 @@ def handle_image_input():
 
         corrected = st.text_area("Extracted / Corrected Text", value=extracted, height=120, key="ocr_corrected")
 
-    return corrected, conf, needs_hitl, tmp_path
+    return corrected, conf, needs_hitl, image_bytes
+
+
+def handle_page_problems(image_bytes: bytes):
+    with st.spinner("Finding problems on the page..."):
+        problems = extract_problems_from_image(image_bytes)
+    st.markdown(f"**{len(problems)} problem(s) found**")
+    edited = []
+    for i, problem in enumerate(problems):
+        st.markdown(f"Problem {i + 1} · OCR Confidence: {confidence_badge(problem['confidence'])}", unsafe_allow_html=True)
+        if problem["needs_hitl"]:
+            st.warning("⚠️ Low OCR confidence — please review this problem.")
+        text = st.text_area(f"Problem {i + 1}", value=problem["text"], height=90, key=f"page_problem_{i}")
+        if text.strip():
+            edited.append(text)
+    st.session_state["page_problems"] = edited
 
 
 def handle_audio_input():
@@ -124,12 +194,16 @@ def handle_audio_input():
     if uploaded is None:
         return "", 0.0, False
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=Path(uploaded.name).suffix) as tmp:
-        tmp.write(uploaded.read())
-        tmp_path = tmp.name
+    progress = st.progress(0, text="Transcribing audio...")
+    partial = st.empty()
+
+    def show_partial(text: str, pct: int):
+        progress.progress(pct, text="Transcribing audio...")
+        partial.caption(text)
 
-    with st.spinner("Transcribing audio..."):
-        transcript, conf, needs_hitl = transcribe_audio(tmp_path)
+    transcript, conf, needs_hitl = transcribe_audio(uploaded.getvalue(), progress_callback=show_partial)
+    progress.empty()
+    partial.empty()
 
     st.markdown(f"**ASR Confidence:** {confidence_badge(conf)}", unsafe_allow_html=True)
     if needs_hitl:
@@ -286,6 +360,33 @@ def main():
 
     st.divider()
 
+    page_problems = st.session_state.get("page_problems", []) if input_type == "image" else []
+    if page_problems:
+        if st.button(f"🚀 Solve All ({len(page_problems)})", type="primary"):
+            progress_bar = st.progress(0)
+            status_text = st.empty()
+
+            def update_batch_progress(msg: str, pct: int):
+                progress_bar.progress(pct)
+                status_text.text(msg)
+
+            with st.spinner("Running agents..."):
+                st.session_state["batch_results"] = orc.run_batch(
+                    page_problems, input_type="image", progress_callback=update_batch_progress
+                )
+            progress_bar.empty()
+            status_text.empty()
+        for i, batch_result in enumerate(st.session_state.get("batch_results") or []):
+            st.header(f"Problem {i + 1}")
+            if batch_result.get("needs_hitl"):
+                st.warning(f"**Needs review:** {batch_result.get('hitl_reason', 'Review needed')}")
+            if batch_result.get("solution", {}).get("answer"):
+                render_solution(batch_result)
+            if batch_result.get("record_id"):
+                render_feedback(batch_result["record_id"], orc)
+            st.divider()
+        return
+
     col_solve, _ = st.columns([1, 4])
     solve_clicked = col_solve.button("🚀 Solve Problem", type="primary", disabled=not raw_input.strip())
 
@@ -0,0 +1,125 @@
+"""Chunked Whisper transcription: VAD segmentation and latency.
+
+Generates a recording of N spoken-like utterances (syllable bursts of voiced
+harmonics) separated by pauses, over background noise, and checks that
+speech_chunks covers every utterance, skips the pauses, and never returns a
+chunk longer than --chunk-seconds. The same recording is checked again at
+-60 dB, like a phone held at a distance, where every frame is quieter than
+-60 dBFS. Exits non-zero when a check fails.
+
+When Whisper is installed it also times a real recording (--audio, or the
+synthetic one) decoded in one shot vs chunked with 1 and --workers models,
+reporting total latency, time to the first partial transcript and the
+confidence score.
+
+    python benchmarks/asr_chunking.py
+    python benchmarks/asr_chunking.py --audio question.m4a --workers 2
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils import audio  # noqa: E402
+
+RATE = audio.SAMPLE_RATE
+
+
+def synthesize(utterances: int, seed: int) -> Tuple[np.ndarray, List[Tuple[float, float]]]:
+    rng = np.random.default_rng(seed)
+    parts, spans, t = [], [], 0.0
+
+    def silence(seconds: float):
+        nonlocal t
+        parts.append(np.zeros(int(seconds * RATE), np.float32))
+        t += seconds
+
+    silence(rng.uniform(0.5, 1.5))
+    for _ in range(utterances):
+        start = t
+        # 4-40 syllables: short answers and long spoken problems alike.
+        for _ in range(rng.integers(4, 40)):
+            length = rng.uniform(0.12, 0.3)
+            n = int(length * RATE)
+            k = np.arange(n) / RATE
+            pitch = rng.uniform(100, 220)
+            voiced = sum(np.sin(2 * np.pi * pitch * h * k) / h for h in range(1, 6))
+            parts.append((0.3 * np.hanning(n) * voiced).astype(np.float32))
+            t += length
+            silence(rng.uniform(0.02, 0.12))
+        spans.append((start, t))
+        silence(rng.uniform(0.8, 3.0))
+    samples = np.concatenate(parts)
+    samples += rng.normal(0, 0.003, len(samples)).astype(np.float32)
+    return samples, spans
+
+
+def check(chunks: List[Tuple[int, int]], spans: List[Tuple[float, float]], max_seconds: float) -> List[str]:
+    errors = []
+    for a, b in chunks:
+        if (b - a) / RATE > max_seconds + 1e-6:
+            errors.append(f"chunk {a / RATE:.2f}-{b / RATE:.2f}s is longer than {max_seconds}s")
+    for start, end in spans:
+        covered = sum(max(0, min(b / RATE, end) - max(a / RATE, start)) for a, b in chunks)
+        if covered < 0.98 * (end - start):
+            errors.append(f"utterance {start:.2f}-{end:.2f}s only {covered / (end - start):.0%} covered")
+    return errors
+
+
+def time_whisper(samples: np.ndarray, workers: List[int]):
+    start = time.perf_counter()
+    with audio._whisper_model() as model:
+        load_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        model.transcribe(samples)
+        one_shot_ms = (time.perf_counter() - start) * 1000
+    print(f"model load {load_ms:.0f} ms; one-shot {one_shot_ms:.0f} ms")
+    print(f"{'workers':>7} {'total ms':>9} {'first ms':>9} {'conf':>5}")
+    for count in workers:
+        audio.ASR_WORKERS = count
+        first = []
+        start = time.perf_counter()
+        _, conf = audio.transcribe_with_whisper_local(
+            samples, lambda text, pct: first or first.append(time.perf_counter() - start)
+        )
+        total_ms = (time.perf_counter() - start) * 1000
+        print(f"{count:>7} {total_ms:>9.0f} {(first or [0])[0] * 1000:>9.0f} {conf:>5.2f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--utterances", type=int, default=8)
+    parser.add_argument("--chunk-seconds", type=float, default=audio.ASR_CHUNK_SECONDS)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--audio", type=Path, help="time Whisper on this recording instead of the synthetic one")
+    args = parser.parse_args()
+
+    samples, spans = synthesize(args.utterances, seed=0)
+    errors = []
+    for label, recording in (("normal", samples), ("quiet", samples * 1e-3)):
+        start = time.perf_counter()
+        chunks = audio.speech_chunks(recording, args.chunk_seconds)
+        vad_ms = (time.perf_counter() - start) * 1000
+        speech = sum(b - a for a, b in chunks) / RATE
+        print(f"{label}: {len(recording) / RATE:.1f}s of audio, {len(spans)} utterances -> {len(chunks)} chunks, "
+              f"{speech:.1f}s kept, VAD {vad_ms:.1f} ms")
+        for error in check(chunks, spans, args.chunk_seconds):
+            print(f"FAIL ({label}): {error}")
+            errors.append(error)
+
+    if audio.WHISPER_AVAILABLE:
+        print()
+        target = audio._samples(args.audio) if args.audio else samples
+        time_whisper(target, sorted({1, args.workers}))
+    else:
+        print("Whisper timing skipped: openai-whisper not installed")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""ParserAgent correction patterns: compiled single pass vs the per-pattern loop.
+
+Builds N synthetic OCR/ASR corrections (misread words and symbols) and inputs
+that contain a handful of them, then times the original loop of str.replace
+calls against the compiled alternation in ParserAgent. With non-overlapping
+originals both must produce the same text; exits non-zero on any mismatch.
+
+    python benchmarks/correction_patterns.py
+    python benchmarks/correction_patterns.py --patterns 10 100 1000 --inputs 2000
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from agents.parser_agent import ParserAgent  # noqa: E402
+
+WORDS = [
+    "find", "value", "roots", "equation", "probability", "matrix", "determinant", "limit",
+    "integral", "derivative", "sum", "series", "circle", "triangle", "quadratic", "function",
+]
+
+
+def loop_apply(patterns: List[Dict], text: str) -> str:
+    for pattern in patterns:
+        original = pattern.get("original", "")
+        correction = pattern.get("correction", "")
+        if original and correction and original in text:
+            text = text.replace(original, correction)
+    return text
+
+
+def make_patterns(n: int, rng: random.Random) -> List[Dict]:
+    # Unique tokens that never occur inside each other or inside a correction,
+    # so the order-dependent loop and the single pass agree.
+    return [{"original": f"~q{i:05d}~", "correction": f"{rng.choice(WORDS)}_{i}"} for i in range(n)]
+
+
+def make_inputs(patterns: List[Dict], count: int, rng: random.Random) -> List[str]:
+    inputs = []
+    for _ in range(count):
+        words = [rng.choice(WORDS) for _ in range(40)]
+        for _ in range(5):
+            words[rng.randrange(len(words))] = rng.choice(patterns)["original"]
+        inputs.append(" ".join(words))
+    return inputs
+
+
+def timed(fn, inputs: List[str]):
+    out, times = [], []
+    for text in inputs:
+        start = time.perf_counter()
+        out.append(fn(text))
+        times.append((time.perf_counter() - start) * 1e6)
+    return out, statistics.median(times)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patterns", nargs="+", type=int, default=[10, 100, 500, 2000])
+    parser.add_argument("--inputs", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    failed = False
+    print(f"{'patterns':>8} {'loop us':>9} {'compiled us':>12} {'compile ms':>11} {'speedup':>8}")
+    for n in args.patterns:
+        patterns = make_patterns(n, rng)
+        inputs = make_inputs(patterns, args.inputs, rng)
+        start = time.perf_counter()
+        agent = ParserAgent(patterns)
+        compile_ms = (time.perf_counter() - start) * 1e3
+        expected, loop_us = timed(lambda t: loop_apply(patterns, t), inputs)
+        got, compiled_us = timed(agent._apply_correction_patterns, inputs)
+        if got != expected:
+            failed = True
+            print(f"{n:>8} MISMATCH on {sum(a != b for a, b in zip(got, expected))} inputs")
+            continue
+        print(f"{n:>8} {loop_us:>9.1f} {compiled_us:>12.1f} {compile_ms:>11.2f} {loop_us / compiled_us:>7.1f}x")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""Parity and throughput check for the RAG embedding backends.
+
+Encodes the knowledge-base chunks with the PyTorch backend and every other
+available backend, reports per-row cosine agreement and sentences/sec, and
+exits non-zero if any backend falls below its parity threshold.
+
+    python -m rag.embeddings export          # once, produces the ONNX models
+    python benchmarks/embedding_backends.py --threads 4
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import KNOWLEDGE_BASE_PATH  # noqa: E402
+from rag.embeddings import BACKENDS, create_embedder  # noqa: E402
+
+MIN_COSINE = {"onnx": 0.999, "onnx-int8": 0.97}
+
+
+def load_sentences(limit: int) -> List[str]:
+    sentences = []
+    for path in sorted(Path(KNOWLEDGE_BASE_PATH).glob("*.txt")):
+        with open(path, "r", encoding="utf-8") as f:
+            sentences.extend(line.strip() for line in f if line.strip())
+    return sentences[:limit]
+
+
+def throughput(embedder, sentences: List[str], batch_size: int, rounds: int) -> float:
+    embedder.encode(sentences[:batch_size], batch_size=batch_size)
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        embedder.encode(sentences, batch_size=batch_size)
+        best = min(best, time.perf_counter() - start)
+    return len(sentences) / best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--threads", type=int, default=0, help="0 = library default")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--limit", type=int, default=512, help="max sentences to encode")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    sentences = load_sentences(args.limit)
+    print(f"{len(sentences)} sentences from the knowledge base, threads={args.threads or 'default'}\n")
+
+    reference = None
+    failed = False
+    for name in ["torch"] + [b for b in args.backends if b != "torch"]:
+        try:
+            embedder = create_embedder(name, threads=args.threads)
+        except (ImportError, FileNotFoundError, ValueError) as e:
+            print(f"{name:>10}: skipped ({e})")
+            continue
+        vectors = embedder.encode(sentences, batch_size=args.batch_size)
+        rate = throughput(embedder, sentences, args.batch_size, args.rounds)
+        line = f"{name:>10}: {rate:8.1f} sentences/sec"
+        if name == "torch":
+            reference = vectors
+        elif reference is not None:
+            cosine = np.sum(vectors * reference, axis=1)
+            ok = cosine.min() >= MIN_COSINE[name]
+            failed |= not ok
+            line += f"  cosine vs torch: mean {cosine.mean():.5f} min {cosine.min():.5f}  {'PASS' if ok else 'FAIL'}"
+        print(line)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
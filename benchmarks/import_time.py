@@ -0,0 +1,100 @@
+"""Cold-import benchmark for the app entry points.
+
+Each module is imported in a fresh interpreter so nothing is shared with
+previous runs. Exits non-zero when any import exceeds its budget.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --budget orchestrator=0.5 --budget app=2.0
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_BUDGETS = {
+    "orchestrator": 1.0,
+    "app": 3.0,
+}
+
+HEAVY_MODULES = ["torch", "sentence_transformers", "faiss", "easyocr", "whisper", "sympy"]
+
+_PROBE = (
+    "import sys, time\n"
+    "t = time.perf_counter()\n"
+    "import {module}\n"
+    "elapsed = time.perf_counter() - t\n"
+    "heavy = [m for m in {heavy!r} if m in sys.modules]\n"
+    "print('RESULT', elapsed, ','.join(heavy))\n"
+)
+
+
+def measure(module: str, repeats: int) -> Tuple[float, List[str], List[Tuple[int, str]]]:
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="0")
+    best = float("inf")
+    heavy: List[str] = []
+    slowest: List[Tuple[int, str]] = []
+    for _ in range(repeats):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        match = re.search(r"^RESULT (\S+) ?(.*)$", proc.stdout, re.MULTILINE)
+        if proc.returncode != 0 or not match:
+            raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+        elapsed = float(match.group(1))
+        if elapsed < best:
+            best = elapsed
+            heavy = [m for m in match.group(2).split(",") if m]
+            slowest = _direct_imports(proc.stderr)
+    return best, heavy, slowest
+
+
+def _direct_imports(importtime_log: str, limit: int = 5) -> List[Tuple[int, str]]:
+    # -X importtime indents nested imports by two spaces per level; keep the
+    # modules imported directly by the probed module.
+    rows = []
+    for line in importtime_log.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)", line)
+        if match and len(match.group(2)) == 3:
+            rows.append((int(match.group(1)), match.group(3)))
+    rows.sort(reverse=True)
+    return rows[:limit]
+
+
+def parse_budgets(values: List[str]) -> Dict[str, float]:
+    budgets = dict(DEFAULT_BUDGETS)
+    for value in values:
+        module, _, seconds = value.partition("=")
+        budgets[module] = float(seconds)
+    return budgets
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", action="append", default=[], help="module=seconds (repeatable)")
+    parser.add_argument("--repeats", type=int, default=3, help="best-of-N cold imports per module")
+    args = parser.parse_args()
+
+    failed = False
+    for module, budget in parse_budgets(args.budget).items():
+        elapsed, heavy, slowest = measure(module, args.repeats)
+        ok = elapsed <= budget
+        failed |= not ok
+        print(f"{'PASS' if ok else 'FAIL'}  import {module}: {elapsed:.3f}s (budget {budget:.2f}s)")
+        if heavy:
+            print(f"      heavy modules loaded eagerly: {', '.join(heavy)}")
+        for micros, name in slowest:
+            print(f"      {micros / 1e6:8.3f}s  {name}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""Multi-process stress test for MemoryStore.
+
+Several writer processes share one MEMORY_DB_PATH and interleave store(),
+update_feedback() and reads; halfway through, each writer drops its store and
+opens a fresh one, so loading (and JSONL compaction) races with other writers.
+Afterwards the test checks that:
+
+  - a freshly opened store holds every record every writer stored, once;
+  - each record carries the feedback its writer set last;
+  - a store that stayed open in the coordinator since before the writers
+    started reports the same totals after its next read (change detection).
+
+Each backend runs in its own interpreter with a temporary db and
+MEMORY_SIMILARITY=minhash, so no encoder is needed. Exits non-zero on any
+lost, duplicated or stale record.
+
+    python benchmarks/memory_multiprocess.py
+    python benchmarks/memory_multiprocess.py --backends sqlite --writers 8 --records 500
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue as queue_module
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _writer(worker: int, records: int, queue):
+    sys.path.insert(0, str(ROOT))
+    from memory.store import MemoryStore
+
+    rng = random.Random(worker)
+    store = MemoryStore()
+    mine: Dict[str, str] = {}
+    for i in range(records):
+        if i == records // 2:
+            store.backend.close()
+            store = MemoryStore()
+        record_id = store.store(
+            input_type=rng.choice(["text", "image", "audio"]),
+            raw_input=f"worker {worker} problem {i}",
+            parsed_question={"problem_text": f"find x if {worker}x + {i} = 0", "topic": "algebra"},
+            retrieved_context=[],
+            final_answer=str(-i / (worker + 1)),
+            explanation="",
+            verifier_outcome={},
+        )
+        mine[record_id] = None
+        if rng.random() < 0.4:
+            target = rng.choice(list(mine))
+            feedback = rng.choice(["correct", "incorrect"])
+            if store.update_feedback(target, feedback, rng.choice(["", f"fix {i}"])):
+                mine[target] = feedback
+        if rng.random() < 0.2:
+            store.get_stats()
+            store.find_similar(f"find x if {worker}x + 1 = 0", "algebra")
+    store.backend.close()
+    queue.put(mine)
+
+
+def run_worker(writers: int, records: int) -> Dict:
+    sys.path.insert(0, str(ROOT))
+    from memory.store import MemoryStore
+
+    observer = MemoryStore()
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    start = time.perf_counter()
+    procs = [ctx.Process(target=_writer, args=(w, records, queue)) for w in range(writers)]
+    for proc in procs:
+        proc.start()
+    expected: Dict[str, str] = {}
+    reported = 0
+    while reported < len(procs):
+        try:
+            expected.update(queue.get(timeout=1))
+            reported += 1
+        except queue_module.Empty:
+            # A writer that crashed never reports; stop once none are left running.
+            if not any(proc.is_alive() for proc in procs) and queue.empty():
+                break
+    for proc in procs:
+        proc.join()
+    seconds = time.perf_counter() - start
+    failures = [f"writer exited with {p.exitcode}" for p in procs if p.exitcode != 0]
+
+    fresh = MemoryStore()
+    ids = [r["id"] for r in fresh.get_all_records()]
+    missing = set(expected) - set(ids)
+    duplicated = len(ids) - len(set(ids))
+    stale = [
+        record_id for record_id, feedback in expected.items()
+        if feedback is not None and record_id not in missing and fresh.get_record(record_id)["user_feedback"] != feedback
+    ]
+    if missing:
+        failures.append(f"{len(missing)} records lost")
+    if duplicated:
+        failures.append(f"{duplicated} duplicate records")
+    if stale:
+        failures.append(f"{len(stale)} records with stale feedback")
+    if observer.get_stats() != fresh.get_stats():
+        failures.append(f"open store saw {observer.get_stats()}, fresh store {fresh.get_stats()}")
+    return {
+        "expected": len(expected),
+        "stored": len(ids),
+        "stats": fresh.get_stats(),
+        "seconds": round(seconds, 2),
+        "failures": failures,
+    }
+
+
+def run_backend(backend: str, writers: int, records: int) -> Dict:
+    with tempfile.TemporaryDirectory(prefix="memory-mp-") as tmp:
+        env = dict(
+            os.environ,
+            MEMORY_BACKEND=backend,
+            MEMORY_SIMILARITY="minhash",
+            MEMORY_DB_PATH=str(Path(tmp) / "memory.json"),
+        )
+        cmd = [
+            sys.executable, str(Path(__file__).resolve()), "--worker",
+            "--writers", str(writers), "--records", str(records),
+        ]
+        proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {"failures": [(proc.stderr.strip().splitlines() or ["coordinator failed"])[-1]]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["sqlite", "jsonl", "json"])
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--records", type=int, default=200, help="records stored per writer")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.writers, args.records)))
+        return 0
+
+    failed = False
+    for backend in args.backends:
+        result = run_backend(backend, args.writers, args.records)
+        if result["failures"]:
+            failed = True
+            print(f"{backend:>7}: FAIL  " + "; ".join(result["failures"]))
+        else:
+            print(
+                f"{backend:>7}: ok  {result['stored']}/{result['expected']} records, "
+                f"stats {result['stats']}, {result['seconds']}s"
+            )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+"""MinHash/LSH vs linear-scan benchmark for MemoryStore.find_similar.
+
+Builds a synthetic memory of templated JEE problems at each size, then runs
+the same queries (near-duplicates of stored problems with one number changed)
+through three paths:
+
+  linear   the original word-set Jaccard scan over every record
+  exact    a brute-force Jaccard scan over the same math tokens LSH uses
+  minhash  LSH candidates re-scored with exact Jaccard
+
+and reports p50/p95 latency, speedup over the linear scan, and minhash
+recall@k against the exact scan (the share of the exact top-k scores that the
+minhash results reach). Each size runs in its own interpreter with a
+temporary JSONL memory (MEMORY_SIMILARITY=minhash), so memory/ is never touched.
+
+    python benchmarks/memory_similarity.py --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+TOP_K = 3
+
+TEMPLATES = {
+    "algebra": [
+        "Find the roots of {v}^2 - {a}{v} + {b} = 0",
+        "Solve for {v}: {a}{v} + {b} = {c}",
+        "Find the sum of the first {a} terms of the AP {b}, {c}, ...",
+        "If {v} + 1/{v} = {a}, find {v}^3 + 1/{v}^3",
+        "Find the coefficient of {v}^{a} in the expansion of (1 + {v})^{b}",
+        "For what values of k does k{v}^2 + {a}{v} + {b} = 0 have equal roots?",
+    ],
+    "calculus": [
+        "Find lim_{{{v}→0}} sin({a}{v})/{v}",
+        "Find the derivative of {v}^{a} + {b}{v} with respect to {v}",
+        "Find the maximum value of f({v}) = -{v}^2 + {a}{v} + {b}",
+        "Evaluate the integral of {a}{v}^{b} d{v} from 0 to {c}",
+        "Find the slope of the tangent to y = {v}^{a} at {v} = {b}",
+    ],
+    "probability": [
+        "A bag has {a} red and {b} blue balls. Find P(red) when {c} balls are drawn without replacement",
+        "Two dice are rolled. Find the probability that the sum is {a}",
+        "A coin is tossed {a} times. Find the probability of exactly {b} heads",
+        "In how many ways can {a} people be seated around a round table with {b} chairs?",
+        "P(A) = 0.{a}, P(B) = 0.{b}, P(A ∩ B) = 0.{c}. Find P(A | B)",
+    ],
+    "linear_algebra": [
+        "Find the determinant of [[{a},{b}],[{c},{d}]]",
+        "Find the inverse of the matrix [[{a},{b}],[{c},{d}]]",
+        "Find the eigenvalues of [[{a},{b}],[{b},{c}]]",
+        "Find the rank of the matrix [[{a},{b},{c}],[{d},{a},{b}]]",
+    ],
+}
+VARIABLES = ["x", "y", "t", "n", "z", "u"]
+
+
+def _problem(rng: random.Random) -> Dict:
+    topic = rng.choice(list(TEMPLATES))
+    values = {k: rng.randint(1, 99) for k in "abcd"}
+    text = rng.choice(TEMPLATES[topic]).format(v=rng.choice(VARIABLES), **values)
+    return {"topic": topic, "problem_text": text}
+
+
+def _perturb(text: str, rng: random.Random) -> str:
+    words = text.split()
+    numeric = [i for i, w in enumerate(words) if any(ch.isdigit() for ch in w)]
+    if numeric:
+        i = rng.choice(numeric)
+        words[i] = "".join(str(rng.randint(0, 9)) if ch.isdigit() else ch for ch in words[i])
+    return " ".join(words)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _write_memory(path: Path, size: int, seed: int) -> List[Dict]:
+    from memory.minhash import MinHasher, SignatureFile, tokenize
+
+    hasher = MinHasher()
+    rng = random.Random(seed)
+    sample = []
+    ids, signatures = [], []
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(size):
+            parsed = _problem(rng)
+            record = {
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "timestamp": "2024-01-01T00:00:00",
+                "input_type": "text",
+                "raw_input": parsed["problem_text"],
+                "parsed_question": parsed,
+                "user_feedback": "incorrect" if rng.random() < 0.05 else "correct",
+                "reviewer_comment": None,
+            }
+            f.write(json.dumps({"op": "put", "record": record}) + "\n")
+            ids.append(record["id"])
+            signatures.append(hasher.signature(tokenize(parsed["problem_text"])))
+            if len(sample) < 1000:
+                sample.append(parsed)
+    SignatureFile(path, hasher).append(ids, signatures)
+    return sample
+
+
+def _score(store, tokens, record: Dict, topic: str) -> float:
+    from memory.minhash import jaccard, tokenize
+    from memory.store import TOPIC_BONUS
+
+    score = jaccard(tokens, tokenize(store._problem_text(record)))
+    return score + (TOPIC_BONUS if store._topic(record) == topic else 0)
+
+
+def _exact_scan(store, problem_text: str, topic: str) -> List[float]:
+    from memory.minhash import tokenize
+    from memory.store import LEXICAL_THRESHOLD
+
+    tokens = tokenize(problem_text)
+    scores = []
+    for record in store.records:
+        if record.get("user_feedback") == "incorrect":
+            continue
+        score = _score(store, tokens, record, topic)
+        if score > LEXICAL_THRESHOLD:
+            scores.append(score)
+    return sorted(scores, reverse=True)[:TOP_K]
+
+
+def run_worker(size: int, queries: int, linear_queries: int, seed: int) -> Dict:
+    sys.path.insert(0, str(ROOT))
+    from memory.minhash import tokenize
+    from memory.store import MemoryStore
+
+    sample = _write_memory(Path(os.environ["MEMORY_DB_PATH"]).with_suffix(".jsonl"), size, seed)
+    start = time.perf_counter()
+    store = MemoryStore()
+    load_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    store._ensure_lsh()
+    lsh_build_seconds = time.perf_counter() - start
+
+    rng = random.Random(seed + 1)
+    picks = [rng.choice(sample) for _ in range(queries)]
+    query_set = [(_perturb(p["problem_text"], rng), p["topic"]) for p in picks]
+    timings = {"linear": [], "exact": [], "minhash": []}
+    recalls = []
+    for i, (text, topic) in enumerate(query_set):
+        t = time.perf_counter()
+        found = store._find_similar_minhash(text, topic, TOP_K)
+        timings["minhash"].append((time.perf_counter() - t) * 1000)
+        if i < linear_queries:
+            t = time.perf_counter()
+            store._find_similar_lexical(text, topic, TOP_K)
+            timings["linear"].append((time.perf_counter() - t) * 1000)
+            t = time.perf_counter()
+            expected = _exact_scan(store, text, topic)
+            timings["exact"].append((time.perf_counter() - t) * 1000)
+            if expected:
+                # Synthetic problems tie a lot, so count found records scoring at
+                # least the k-th best exact score rather than comparing ids.
+                tokens = tokenize(text)
+                good = sum(1 for r in found if _score(store, tokens, r, topic) >= expected[-1] - 1e-9)
+                recalls.append(min(good, len(expected)) / len(expected))
+
+    result = {
+        "records": len(store.records),
+        "load_seconds": round(load_seconds, 3),
+        "lsh_build_seconds": round(lsh_build_seconds, 3),
+        f"minhash_recall@{TOP_K}": round(sum(recalls) / len(recalls), 4) if recalls else None,
+    }
+    for name, values in timings.items():
+        result[f"{name}_p50_ms"] = round(_percentile(values, 50), 3)
+        result[f"{name}_p95_ms"] = round(_percentile(values, 95), 3)
+    result["speedup_p50"] = round(result["linear_p50_ms"] / max(result["minhash_p50_ms"], 1e-6), 1)
+    return result
+
+
+def run_size(size: int, queries: int, linear_queries: int, seed: int) -> Dict:
+    with tempfile.TemporaryDirectory(prefix="memory-bench-") as tmp:
+        env = dict(
+            os.environ,
+            MEMORY_BACKEND="jsonl",
+            MEMORY_SIMILARITY="minhash",
+            MEMORY_DB_PATH=str(Path(tmp) / "memory.json"),
+        )
+        cmd = [
+            sys.executable, str(Path(__file__).resolve()), "--worker",
+            "--sizes", str(size), "--queries", str(queries),
+            "--linear-queries", str(linear_queries), "--seed", str(seed),
+        ]
+        proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {"error": (proc.stderr.strip().splitlines() or ["worker failed"])[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=50, help="timed minhash queries per size")
+    parser.add_argument("--linear-queries", type=int, default=10, help="of those, also run through the linear scans")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--min-recall", type=float, default=0.8, help="exit non-zero below this recall")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    linear_queries = min(args.linear_queries, args.queries)
+
+    if args.worker:
+        print(json.dumps(run_worker(args.sizes[0], args.queries, linear_queries, args.seed)))
+        return 0
+
+    report = {"generated": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": {}}
+    failed = False
+    for size in args.sizes:
+        result = run_size(size, args.queries, linear_queries, args.seed)
+        report["results"][str(size)] = result
+        if "error" in result:
+            print(f"{size:>9}: failed ({result['error']})")
+            failed = True
+            continue
+        recall = result[f"minhash_recall@{TOP_K}"]
+        print(
+            f"{size:>9}: linear p50 {result['linear_p50_ms']:.1f}ms  exact p50 {result['exact_p50_ms']:.1f}ms  "
+            f"minhash p50 {result['minhash_p50_ms']:.2f}ms p95 {result['minhash_p95_ms']:.2f}ms  "
+            f"x{result['speedup_p50']}  recall@{TOP_K} {recall}  (lsh build {result['lsh_build_seconds']}s)"
+        )
+        if recall is not None and recall < args.min_recall:
+            failed = True
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\nReport written to {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""Per-image OCR latency.
+
+Renders synthetic problem images with Pillow, then times
+  - uncached: easyocr.Reader(...) built for every image (the old behaviour);
+  - cached:   utils.ocr.ocr_with_easyocr, after the WarmupManager has loaded
+              the reader;
+and reports p50/p95 per image plus the one-off warm-up cost. Both paths must
+read the same text; exits non-zero on a mismatch.
+
+Then runs extract_text_from_image in sequential and concurrent mode and
+reports p50/p95 per image with each engine's mean latency and win rate.
+Sections whose engines are not installed are skipped.
+
+    python benchmarks/ocr_latency.py
+    python benchmarks/ocr_latency.py --images 10 --modes concurrent
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils import ocr  # noqa: E402
+from utils.warmup import WarmupManager  # noqa: E402
+
+PROBLEMS = [
+    "Find the roots of x^2 - 5x + 6 = 0",
+    "Evaluate the limit of sin(x)/x as x tends to 0",
+    "Two dice are thrown. Find P(sum = 7)",
+    "Find the determinant of [[2, 1], [3, 4]]",
+    "Differentiate f(x) = x^3 + 2x",
+    "Sum of the first 20 terms of 3, 7, 11, ...",
+]
+
+
+def render_images(count: int, out_dir: Path) -> List[str]:
+    from PIL import Image, ImageDraw, ImageFont
+
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", 28)
+    except OSError:
+        font = ImageFont.load_default()
+    paths = []
+    for i in range(count):
+        image = Image.new("RGB", (900, 80), "white")
+        ImageDraw.Draw(image).text((20, 20), PROBLEMS[i % len(PROBLEMS)], fill="black", font=font)
+        path = out_dir / f"problem_{i}.png"
+        image.save(path)
+        paths.append(str(path))
+    return paths
+
+
+def uncached(path: str):
+    import easyocr
+
+    results = easyocr.Reader(["en"], gpu=False).readtext(path)
+    return " ".join(r[1] for r in results)
+
+
+def cached(path: str):
+    return ocr.ocr_with_easyocr(path)[0]
+
+
+def timed(fn, paths: List[str]):
+    texts, times = [], []
+    for path in paths:
+        start = time.perf_counter()
+        texts.append(fn(path))
+        times.append((time.perf_counter() - start) * 1000)
+    return texts, times
+
+
+def pct(times: List[float], q: float) -> float:
+    return statistics.quantiles(times, n=100)[int(q) - 1] if len(times) > 1 else times[0]
+
+
+def compare_readers(paths: List[str]) -> bool:
+    before_texts, before = timed(uncached, paths)
+    start = time.perf_counter()
+    WarmupManager(["ocr"]).start().wait()
+    warmup_ms = (time.perf_counter() - start) * 1000
+    after_texts, after = timed(cached, paths)
+
+    print(f"EasyOCR reader, warm-up {warmup_ms:.0f} ms (once per process)")
+    print(f"{'path':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for name, times in (("uncached", before), ("cached", after)):
+        print(f"{name:>9} {pct(times, 50):>9.1f} {pct(times, 95):>9.1f}")
+    print(f"speedup (p50): {pct(before, 50) / pct(after, 50):.1f}x\n")
+    if before_texts != after_texts:
+        print("FAIL: cached reader returned different text")
+        return False
+    return True
+
+
+def compare_modes(paths: List[str], modes: List[str]):
+    print(f"{'mode':>11} {'p50 ms':>9} {'p95 ms':>9}   engines")
+    for mode in modes:
+        ocr.reset_ocr_engine_stats()
+        _, times = timed(lambda p: ocr.extract_text_from_image(p, mode=mode), paths)
+        engines = "  ".join(
+            f"{name} {s['mean_ms']:.0f} ms/{s['win_rate']:.0%} won"
+            for name, s in ocr.ocr_engine_stats().items()
+        )
+        print(f"{mode:>11} {pct(times, 50):>9.1f} {pct(times, 95):>9.1f}   {engines}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=6)
+    parser.add_argument("--modes", nargs="+", default=["sequential", "concurrent"])
+    args = parser.parse_args()
+
+    if not ocr.PIL_AVAILABLE or not (ocr.EASYOCR_AVAILABLE or ocr.TESSERACT_AVAILABLE):
+        print("skipped: needs Pillow and pytesseract or easyocr (pip install pillow pytesseract easyocr)")
+        return 0
+
+    ok = True
+    with tempfile.TemporaryDirectory(prefix="ocr-bench-") as tmp:
+        paths = render_images(args.images, Path(tmp))
+        print(f"{args.images} images\n")
+        if ocr.EASYOCR_AVAILABLE:
+            ok = compare_readers(paths)
+        else:
+            print("EasyOCR reader comparison skipped: easyocr not installed\n")
+        compare_modes(paths, args.modes)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
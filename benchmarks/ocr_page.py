@@ -0,0 +1,130 @@
+"""Multi-problem page OCR: segmentation accuracy and serial vs pooled recognition.
+
+Renders a worksheet page (A4 at 300 DPI) with N numbered problems, some
+spanning two lines, some with "(a)/(b)" sub-parts and one with "(1)"-"(4)"
+MCQ options, then runs extract_problems_from_image with one worker and with
+the process pool. It reports the page latency for each and checks that
+exactly N problems come back, in order, each containing its own distinctive
+word. Before that, it checks which paragraph openings start a problem; that
+check needs no OCR. Exits non-zero on a segmentation error; prints a skip
+notice for the page run when pytesseract or Pillow is missing.
+
+    python benchmarks/ocr_page.py
+    python benchmarks/ocr_page.py --problems 12 --workers 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils import ocr  # noqa: E402
+
+STEMS = [
+    ("quadratic", "Solve the quadratic x^2 - 5x + 6 = 0."),
+    ("limit", "Evaluate the limit of sin(3x)/x as x tends to 0."),
+    ("dice", "Two dice are thrown together.", "Find the probability that the sum is 8."),
+    ("vertex", "The vertex of y = x^2 - 4x + 1 is", "(1) (2, -3)", "(2) (-2, 3)", "(3) (2, 3)", "(4) (-2, -3)"),
+    ("determinant", "Find the determinant of [[1, 2], [3, 4]]."),
+    ("derivative", "Find the derivative of x^3 + 4x.", "(a) at x = 1", "(b) at x = 2"),
+    ("progression", "The 5th term of an arithmetic progression is 17", "and the 9th term is 29. Find the first term."),
+    ("binomial", "Find the coefficient of x^4 in (1 + x)^10."),
+    ("integral", "Evaluate the integral of 2x from 0 to 3."),
+]
+
+# Paragraph opening -> whether it starts a new problem.
+OPENINGS = [
+    ("Q1. Find the roots", True),
+    ("Q.2 Evaluate", True),
+    ("Question 3 Two dice", True),
+    ("4. Find the determinant", True),
+    ("5) Differentiate", True),
+    ("(1) (2, -3)", False),
+    ("(4) -3", False),
+    ("(a) at x = 1", False),
+    ("3.5 is the answer", False),
+    ("and the 9th term is 29", False),
+]
+
+
+def render_page(count: int, path: Path) -> List[str]:
+    from PIL import Image, ImageDraw, ImageFont
+
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", 42)
+    except OSError:
+        font = ImageFont.load_default()
+    page = Image.new("L", (2480, 3508), 255)
+    draw = ImageDraw.Draw(page)
+    keywords, y = [], 200
+    for i in range(count):
+        keyword, *lines = STEMS[i % len(STEMS)]
+        keywords.append(keyword)
+        for j, line in enumerate(lines):
+            prefix = f"{i + 1}. " if j == 0 else "     "
+            draw.text((180, y), prefix + line, fill=0, font=font)
+            y += 62
+        y += 110
+    page.save(path)
+    return keywords
+
+
+def check(problems: List[dict], keywords: List[str]) -> List[str]:
+    errors = []
+    if len(problems) != len(keywords):
+        errors.append(f"found {len(problems)} problems, expected {len(keywords)}")
+    for i, (problem, keyword) in enumerate(zip(problems, keywords)):
+        if keyword not in problem["text"].lower():
+            errors.append(f"problem {i + 1} lacks '{keyword}': {problem['text'][:60]!r}")
+    return errors
+
+
+def timed(path: str, workers: int, rounds: int) -> Tuple[List[dict], float]:
+    best, problems = float("inf"), []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        problems = ocr.extract_problems_from_image(path, workers=workers)
+        best = min(best, time.perf_counter() - start)
+    return problems, best * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--problems", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    failed = False
+    for text, starts in OPENINGS:
+        if bool(ocr.PROBLEM_START.match(text)) != starts:
+            print(f"FAIL: {text!r} should {'' if starts else 'not '}start a problem")
+            failed = True
+    print(f"problem openings: {'FAIL' if failed else 'ok'}")
+
+    if not ocr.TESSERACT_AVAILABLE or not ocr.PIL_AVAILABLE:
+        print("page run skipped: needs pytesseract and Pillow (pip install pytesseract pillow)")
+        return 1 if failed else 0
+
+    with tempfile.TemporaryDirectory(prefix="ocr-page-") as tmp:
+        path = Path(tmp) / "worksheet.png"
+        keywords = render_page(args.problems, path)
+        # Start the pool outside the timing; workers are reused across pages.
+        ocr.extract_problems_from_image(str(path), workers=args.workers)
+        for workers in sorted({1, args.workers}):
+            problems, ms = timed(str(path), workers, args.rounds)
+            errors = check(problems, keywords)
+            status = "ok" if not errors else "FAIL"
+            print(f"workers={workers:<3} {ms:8.0f} ms/page  {len(problems)} problems  {status}")
+            for error in errors:
+                print(f"    {error}")
+            failed |= bool(errors)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""OCR preprocessing: Tesseract latency and confidence with and without it.
+
+The sample set is generated deterministically so no binary fixtures live in
+the repo: worksheet-style problems are rendered at phone-photo resolution
+(about 480 DPI on an A4 width), then rotated a few degrees, lit unevenly,
+blurred and given sensor noise, with wide page margins around the text.
+
+For each sample it reports the preprocessing time, the image size handed to
+Tesseract, and (when Tesseract is installed) OCR latency and mean word
+confidence for the raw image vs the preprocessing steps given with --steps
+(all of them by default, whatever OCR_PREPROCESS is set to). It also checks
+that deskew recovers the applied rotation. Exits non-zero when deskew misses
+by more than --max-angle-error degrees or preprocessing lowers mean
+confidence. Preprocessing is off by default; run this with Tesseract
+installed before enabling it.
+
+    python benchmarks/ocr_preprocess.py
+    python benchmarks/ocr_preprocess.py --steps crop downscale grayscale
+    python benchmarks/ocr_preprocess.py --samples 12 --save /tmp/ocr-samples
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils import ocr  # noqa: E402
+
+PROBLEMS = [
+    "Q1. Find the roots of x^2 - 5x + 6 = 0.",
+    "Q2. Evaluate the limit of (1 - cos x)/x^2 as x tends to 0.",
+    "Q3. Two dice are thrown. Find the probability that the sum is 7.",
+    "Q4. Find the determinant of the matrix [[2, 1], [3, 4]].",
+    "Q5. Differentiate f(x) = x^3 + 2x with respect to x.",
+    "Q6. Find the sum of the first 20 terms of 3, 7, 11, ...",
+]
+
+
+def make_sample(seed: int):
+    from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+    rng = random.Random(seed)
+    width, height = 4000, 5600
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", 64)
+    except OSError:
+        font = ImageFont.load_default()
+    page = Image.new("L", (width, height), 235)
+    draw = ImageDraw.Draw(page)
+    top = rng.randint(600, 1400)
+    lines = rng.sample(PROBLEMS, 4)
+    for i, line in enumerate(lines):
+        draw.text((rng.randint(500, 700), top + i * 140), line, fill=30, font=font)
+    angle = rng.uniform(-6, 6)
+    page = page.rotate(angle, resample=Image.BICUBIC, fillcolor=235)
+
+    pixels = np.asarray(page, dtype=np.float32)
+    light = np.linspace(1.0, rng.uniform(0.6, 0.8), width, dtype=np.float32)[None, :]
+    noise = np.random.default_rng(seed).normal(0, 8, pixels.shape).astype(np.float32)
+    pixels = np.clip(pixels * light + noise, 0, 255).astype(np.uint8)
+    image = Image.fromarray(pixels).filter(ImageFilter.GaussianBlur(1.2)).convert("RGB")
+    return image, angle, " ".join(lines)
+
+
+def tesseract(image) -> Tuple[str, float, float]:
+    import pytesseract
+
+    start = time.perf_counter()
+    data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+    ms = (time.perf_counter() - start) * 1000
+    confs = [float(c) for c in data["conf"] if float(c) > 0]
+    text = " ".join(w for w, c in zip(data["text"], data["conf"]) if float(c) > 0 and w.strip())
+    return text, (sum(confs) / len(confs) / 100.0 if confs else 0.0), ms
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=6)
+    parser.add_argument("--max-angle-error", type=float, default=0.5)
+    parser.add_argument("--steps", nargs="+", choices=ocr.PREPROCESS_STEPS, default=list(ocr.PREPROCESS_STEPS))
+    parser.add_argument("--save", type=Path, help="also write the samples and preprocessed images here")
+    args = parser.parse_args()
+
+    if not ocr.PIL_AVAILABLE:
+        print("skipped: needs Pillow (pip install pillow)")
+        return 0
+    run_ocr = ocr.TESSERACT_AVAILABLE
+    if not run_ocr:
+        print("pytesseract not installed: timing preprocessing only\n")
+    if args.save:
+        args.save.mkdir(parents=True, exist_ok=True)
+
+    failed = False
+    rows: List[dict] = []
+    for seed in range(args.samples):
+        image, angle, _ = make_sample(seed)
+        start = time.perf_counter()
+        prepared = ocr.preprocess_image(image, args.steps)
+        prep_ms = (time.perf_counter() - start) * 1000
+        detected = ocr._skew_angle(ocr.preprocess_image(image, ["crop", "downscale", "threshold"]))
+        row = {
+            "seed": seed, "angle": angle, "detected": detected, "prep_ms": prep_ms,
+            "raw_size": image.size, "size": prepared.size,
+        }
+        if run_ocr:
+            _, row["raw_conf"], row["raw_ms"] = tesseract(image)
+            _, row["conf"], row["ms"] = tesseract(prepared)
+        if args.save:
+            image.save(args.save / f"sample_{seed}.jpg", quality=85)
+            prepared.save(args.save / f"sample_{seed}_prepared.png")
+        rows.append(row)
+
+    print(f"{'sample':>6} {'skew':>6} {'fix':>6} {'prep ms':>8} {'size':>11}", end="")
+    print(f" {'raw ms':>8} {'ms':>8} {'raw conf':>9} {'conf':>6}" if run_ocr else "")
+    for r in rows:
+        size = f"{r['size'][0]}x{r['size'][1]}"
+        print(f"{r['seed']:>6} {r['angle']:>6.1f} {r['detected']:>6.1f} {r['prep_ms']:>8.0f} {size:>11}", end="")
+        print(f" {r['raw_ms']:>8.0f} {r['ms']:>8.0f} {r['raw_conf']:>9.2f} {r['conf']:>6.2f}" if run_ocr else "")
+
+    pixels = statistics.mean(r["size"][0] * r["size"][1] / (r["raw_size"][0] * r["raw_size"][1]) for r in rows)
+    print(f"\nmean preprocessing {statistics.mean(r['prep_ms'] for r in rows):.0f} ms, "
+          f"image area {pixels:.1%} of the original")
+    if run_ocr:
+        raw_conf = statistics.mean(r["raw_conf"] for r in rows)
+        conf = statistics.mean(r["conf"] for r in rows)
+        raw_ms = statistics.mean(r["raw_ms"] for r in rows)
+        ms = statistics.mean(r["ms"] + r["prep_ms"] for r in rows)
+        print(f"tesseract: {raw_ms:.0f} -> {ms:.0f} ms per image (incl. preprocessing), "
+              f"mean confidence {raw_conf:.2f} -> {conf:.2f}")
+        if conf < raw_conf:
+            print("FAIL: preprocessing lowered mean confidence")
+            failed = True
+    if any(abs(r["detected"] + r["angle"]) > args.max_angle_error for r in rows):
+        print(f"FAIL: deskew missed the applied rotation by more than {args.max_angle_error} degrees")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
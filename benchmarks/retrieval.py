@@ -0,0 +1,180 @@
+"""Retrieval quality and latency benchmark for RAGPipeline.
+
+Runs the labelled queries in benchmarks/retrieval_queries.json against a
+fresh index for every (embedding backend, index type) combination and
+reports recall@k, MRR and p50/p95 retrieve latency. A hit is a chunk from
+the expected source that contains the query's evidence line.
+
+Every combination runs in its own interpreter with its own temporary
+VECTOR_STORE_PATH, so the shipped vector store is never touched. Hugging
+Face downloads are disabled: models must already be in the local cache.
+
+    python benchmarks/retrieval.py --output bench_retrieval.json
+    python benchmarks/retrieval.py --baseline bench_retrieval.json   # regression gate
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+QUERIES_PATH = Path(__file__).resolve().parent / "retrieval_queries.json"
+KS = (1, 3, 5)
+MRR_DEPTH = 10
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _is_hit(chunk: dict, entry: dict) -> bool:
+    return chunk["source"] == entry["source"] and entry["evidence"] in chunk["text"]
+
+
+def run_worker(use_topic: bool, repeats: int) -> Dict:
+    sys.path.insert(0, str(ROOT))
+    from config import RAG_RERANK_ENABLED
+    from rag.pipeline import RAGPipeline
+    from rag.rerank import get_reranker
+
+    queries = json.loads(QUERIES_PATH.read_text(encoding="utf-8"))
+    start = time.perf_counter()
+    rag = RAGPipeline()
+    build_seconds = time.perf_counter() - start
+    if RAG_RERANK_ENABLED:
+        get_reranker().load()
+    rag.retrieve("warm up")
+
+    hits = {k: 0 for k in KS}
+    reciprocal_ranks = []
+    latencies_ms = []
+    misses = []
+    for entry in queries:
+        topic = entry.get("topic") if use_topic else None
+        for _ in range(repeats):
+            t = time.perf_counter()
+            results = rag.retrieve(entry["query"], MRR_DEPTH, topic)
+            latencies_ms.append((time.perf_counter() - t) * 1000)
+        rank = next((i + 1 for i, c in enumerate(results) if _is_hit(c, entry)), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+        for k in KS:
+            hits[k] += bool(rank and rank <= k)
+        if not rank or rank > max(KS):
+            misses.append({"query": entry["query"], "section": entry["section"], "rank": rank})
+
+    n = len(queries)
+    return {
+        "queries": n,
+        "chunks": len(rag.chunks),
+        "build_seconds": round(build_seconds, 3),
+        **{f"recall@{k}": round(hits[k] / n, 4) for k in KS},
+        "mrr": round(sum(reciprocal_ranks) / n, 4),
+        "latency_p50_ms": round(_percentile(latencies_ms, 50), 3),
+        "latency_p95_ms": round(_percentile(latencies_ms, 95), 3),
+        "misses": misses,
+    }
+
+
+def run_combination(backend: str, index_type: str, use_topic: bool, rerank: bool, repeats: int) -> Dict:
+    with tempfile.TemporaryDirectory(prefix="rag-bench-") as store:
+        env = dict(
+            os.environ,
+            EMBEDDING_BACKEND=backend,
+            RAG_INDEX_TYPE=index_type,
+            RAG_RERANK_ENABLED="true" if rerank else "false",
+            VECTOR_STORE_PATH=store,
+            HF_HUB_OFFLINE="1",
+            TRANSFORMERS_OFFLINE="1",
+        )
+        cmd = [sys.executable, str(Path(__file__).resolve()), "--worker", "--repeats", str(repeats)]
+        if use_topic:
+            cmd.append("--topic")
+        proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {"error": (proc.stderr.strip().splitlines() or ["worker failed"])[-1]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(report: Dict, baseline: Dict, max_quality_drop: float, max_latency_increase: float) -> List[str]:
+    problems = []
+    for name, current in report["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or "error" in current or "error" in previous:
+            continue
+        for metric in [f"recall@{k}" for k in KS] + ["mrr"]:
+            if current[metric] < previous[metric] - max_quality_drop:
+                problems.append(f"{name}: {metric} {previous[metric]:.3f} -> {current[metric]:.3f}")
+        limit = previous["latency_p95_ms"] * (1 + max_latency_increase)
+        if current["latency_p95_ms"] > limit:
+            problems.append(
+                f"{name}: p95 latency {previous['latency_p95_ms']:.2f}ms -> {current['latency_p95_ms']:.2f}ms"
+            )
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--index-types", nargs="+", default=["flat", "hnsw", "numpy"])
+    parser.add_argument("--topic", action="store_true", help="pass each query's labelled topic to retrieve()")
+    parser.add_argument("--rerank", action="store_true", help="also run every combination with cross-encoder reranking")
+    parser.add_argument("--repeats", type=int, default=5, help="timed retrieve calls per query")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="previous JSON report to gate against")
+    parser.add_argument("--max-quality-drop", type=float, default=0.02)
+    parser.add_argument("--max-latency-increase", type=float, default=0.5, help="allowed p95 growth, 0.5 = +50%%")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.topic, args.repeats)))
+        return 0
+
+    report = {"generated": time.strftime("%Y-%m-%dT%H:%M:%S"), "topic_routing": args.topic, "results": {}}
+    combinations = [
+        (backend, index_type, rerank)
+        for backend in args.backends
+        for index_type in args.index_types
+        for rerank in ([False, True] if args.rerank else [False])
+    ]
+    for backend, index_type, rerank in combinations:
+        name = f"{backend}/{index_type}" + ("+rerank" if rerank else "")
+        result = run_combination(backend, index_type, args.topic, rerank, args.repeats)
+        report["results"][name] = result
+        if "error" in result:
+            print(f"{name:>24}: skipped ({result['error']})")
+            continue
+        print(
+            f"{name:>24}: "
+            + "  ".join(f"R@{k} {result[f'recall@{k}']:.3f}" for k in KS)
+            + f"  MRR {result['mrr']:.3f}"
+            + f"  p50 {result['latency_p50_ms']:.2f}ms  p95 {result['latency_p95_ms']:.2f}ms"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\nReport written to {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        problems = compare(report, baseline, args.max_quality_drop, args.max_latency_increase)
+        if problems:
+            print("\nREGRESSIONS vs baseline:")
+            for problem in problems:
+                print(f"  {problem}")
+            return 1
+        print("\nNo regressions vs baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""Math-speech normalizer: golden cases and single pass vs the replace loop.
+
+Checks normalize_math_speech against a table of spoken inputs and their
+expected rewrites, covering word boundaries ("pipeline", "sometimes"),
+longest match ("raised to the power of" vs "raised to"), fractions,
+subscripts, integrals and comparisons. Then times, on ASR-length
+transcripts:
+  - the original loop of 18 str.replace calls (no word boundaries, so it is
+    faster but wrong on the boundary cases above);
+  - one word-bounded re.sub pass per phrase and rule of the current
+    vocabulary, which is what the loop costs once it is made correct;
+  - the compiled single pass.
+Exits non-zero when a golden case fails.
+
+    python benchmarks/speech_normalizer.py
+    python benchmarks/speech_normalizer.py --inputs 5000 --words 200
+"""
+import argparse
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.math_speech import MATH_PHRASES, MATH_RULES, normalize_math_speech  # noqa: E402
+
+GOLDEN = [
+    ("x squared plus 5 x plus 6 equals 0", "x ^2 + 5 x + 6 = 0"),
+    ("X Cubed Minus 1", "x ^3 - 1"),
+    ("the pipeline sometimes fails", "the pipeline sometimes fails"),
+    ("spinning times the radius", "spinning * the radius"),
+    ("a plural of minuses", "a plural of minuses"),
+    ("2 raised to the power of n", "2 ^ n"),
+    ("2 raised to n", "2 ^ n"),
+    ("e to the power of x", "e ^ x"),
+    ("10 divided by 2 multiplied by 3", "10 / 2 * 3"),
+    ("square root of x plus 1", "sqrt( x + 1"),
+    ("sine of x plus cosine of x", "sin( x + cos( x"),
+    ("pi times r squared", "π * r ^2"),
+    ("x plus or minus 2", "x ± 2"),
+    ("x is less than or equal to 5", "x ≤ 5"),
+    ("y is greater than 3", "y > 3"),
+    ("a is not equal to b", "a ≠ b"),
+    ("natural log of x", "ln of x"),
+    ("log base 2 of 8", "log_2 of 8"),
+    ("log base e of x", "log_e of x"),
+    ("a sub n plus 1", "a_n + 1"),
+    ("x  sub  2 minus x sub 1", "x_2 - x_1"),
+    ("x over 2 plus 1 over y", "x/2 + 1/y"),
+    ("one half of three quarters", "1/2 of 3/4"),
+    ("two thirds plus 5 sixths", "2/3 + 5/6"),
+    ("the third term", "the third term"),
+    ("integral of x dx", "∫ x dx"),
+    ("integral from 0 to 1 of x squared dx", "∫_0^1 x ^2 dx"),
+    ("integral from minus infinity to infinity of e", "∫_-∞^∞ e"),
+    ("integral from 0 to pi of sine of x dx", "∫_0^π sin( x dx"),
+    ("limit as x tends to infinity", "limit as x tends to ∞"),
+    ("open bracket x plus 1 close bracket squared", "( x + 1 ) ^2"),
+    ("", ""),
+]
+
+LEGACY = {
+    "square root of": "sqrt(", "squared": "^2", "cubed": "^3", "raised to the power of": "^",
+    "raised to": "^", "divided by": "/", "multiplied by": "*", "times": "*", "plus": "+",
+    "minus": "-", "equals": "=", "pi": "π", "infinity": "∞", "log base": "log_",
+    "natural log": "ln", "sine of": "sin(", "cosine of": "cos(", "tangent of": "tan(",
+}
+
+WORDS = [
+    "find", "the", "value", "of", "x", "y", "2", "3", "squared", "plus", "minus", "times",
+    "equals", "divided", "by", "sine", "pi", "integral", "from", "to", "dx", "root", "square",
+    "over", "sub", "n", "one", "third", "is", "less", "than", "limit", "infinity",
+]
+
+
+def legacy(text: str) -> str:
+    result = text.lower()
+    for phrase, symbol in LEGACY.items():
+        result = result.replace(phrase, symbol)
+    return result
+
+
+def per_pattern_passes() -> Callable[[str], str]:
+    passes = [
+        (re.compile(rf"(?<!\w){pattern}(?!\w)"), lambda m, rewrite=rewrite: rewrite(*m.groups()))
+        for pattern, rewrite in MATH_RULES
+    ]
+    for phrase in sorted(MATH_PHRASES, key=len, reverse=True):
+        words = r"\s+".join(map(re.escape, phrase.split()))
+        passes.append((re.compile(rf"(?<!\w){words}(?!\w)"), MATH_PHRASES[phrase]))
+
+    def apply(text: str) -> str:
+        text = text.lower()
+        for regex, replacement in passes:
+            text = regex.sub(replacement, text)
+        return text
+
+    return apply
+
+
+def timed(fn: Callable[[str], str], inputs: List[str]) -> float:
+    times = []
+    for text in inputs:
+        start = time.perf_counter()
+        fn(text)
+        times.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(times)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inputs", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=60, help="words per transcript")
+    args = parser.parse_args()
+
+    failures = [(text, want, normalize_math_speech(text)) for text, want in GOLDEN]
+    failures = [f for f in failures if f[1] != f[2]]
+    for text, want, got in failures:
+        print(f"FAIL: {text!r}\n    expected {want!r}\n    got      {got!r}")
+    print(f"golden cases: {len(GOLDEN) - len(failures)}/{len(GOLDEN)} ok\n")
+
+    rng = random.Random(0)
+    inputs = [" ".join(rng.choice(WORDS) for _ in range(args.words)) for _ in range(args.inputs)]
+    loop_us = timed(legacy, inputs)
+    passes_us = timed(per_pattern_passes(), inputs)
+    compiled_us = timed(normalize_math_speech, inputs)
+    patterns = len(MATH_PHRASES) + len(MATH_RULES)
+    print(f"{args.words}-word transcripts, median of {args.inputs}")
+    print(f"{'replace loop (18 phrases)':>32} {loop_us:8.1f} us")
+    print(f"{f'regex per pattern ({patterns})':>32} {passes_us:8.1f} us")
+    print(f"{'single pass':>32} {compiled_us:8.1f} us  ({passes_us / compiled_us:.1f}x faster than per pattern)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
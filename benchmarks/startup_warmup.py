@@ -0,0 +1,109 @@
+"""First-request latency after startup, with and without the model warm-up.
+
+Each run is a fresh process. It waits --delay seconds, standing in for the
+time between the app starting and the first user request. Then it times the
+first embedding query, the first OCR of a rendered problem image and the
+first transcription of a second of audio. The "warm" run starts the
+WarmupManager before waiting; the "cold" run does not. It prints each model's
+warm-up state and load time and the first-request latency in both runs.
+Steps whose models are not installed are skipped. Exits non-zero when a
+warm-up task fails.
+
+    python benchmarks/startup_warmup.py
+    python benchmarks/startup_warmup.py --delay 0 --models ocr asr
+"""
+import argparse
+import io
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def first_requests() -> Dict[str, float]:
+    import numpy as np
+
+    from utils import audio, ocr
+
+    timings = {}
+    try:
+        from rag.pipeline import get_embed_model
+        start = time.perf_counter()
+        get_embed_model().encode(["Find the roots of x^2 - 5x + 6 = 0"])
+        timings["embed query"] = time.perf_counter() - start
+    except (ImportError, OSError):
+        pass
+    if ocr.PIL_AVAILABLE and (ocr.EASYOCR_AVAILABLE or ocr.TESSERACT_AVAILABLE):
+        from PIL import Image, ImageDraw
+
+        image = Image.new("RGB", (700, 80), "white")
+        ImageDraw.Draw(image).text((20, 30), "Find the roots of x^2 - 5x + 6 = 0", fill="black")
+        buf = io.BytesIO()
+        image.save(buf, "PNG")
+        start = time.perf_counter()
+        ocr.ocr_with_easyocr(buf.getvalue()) if ocr.EASYOCR_AVAILABLE else ocr.extract_text_from_image(buf.getvalue())
+        timings["ocr image"] = time.perf_counter() - start
+    if audio.WHISPER_AVAILABLE:
+        t = np.arange(audio.SAMPLE_RATE) / audio.SAMPLE_RATE
+        start = time.perf_counter()
+        audio.transcribe_with_whisper_local((0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32))
+        timings["transcribe 1 s"] = time.perf_counter() - start
+    return timings
+
+
+def child(warm: bool, delay: float, models: List[str]) -> int:
+    status = {}
+    if warm:
+        from utils.warmup import WarmupManager
+
+        manager = WarmupManager(models).start()
+    time.sleep(delay)
+    timings = first_requests()
+    if warm:
+        manager.wait()
+        status = manager.status()
+    print(json.dumps({"timings": timings, "status": status}))
+    return 0
+
+
+def run(warm: bool, delay: float, models: List[str]) -> Dict:
+    cmd = [sys.executable, __file__, "--child", "warm" if warm else "cold", "--delay", str(delay), "--models", *models]
+    proc = subprocess.run(cmd, capture_output=True, text=True, cwd=ROOT)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip())
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delay", type=float, default=20.0, help="seconds from startup to the first request")
+    parser.add_argument("--models", nargs="+", default=["embeddings", "ocr", "asr"])
+    parser.add_argument("--child", choices=["cold", "warm"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args.child == "warm", args.delay, args.models)
+
+    cold, warm = run(False, args.delay, args.models), run(True, args.delay, args.models)
+    failed = False
+    print("warm-up")
+    for s in warm["status"].values():
+        seconds = f"{s['seconds']:.1f} s" if s["seconds"] is not None else "-"
+        print(f"  {s['label']:<11} {s['state']:<8} {seconds:>8}  {s['error'][:60]}")
+        failed |= s["state"] == "failed"
+    if not cold["timings"]:
+        print("\nfirst-request timing skipped: no models installed")
+        return 1 if failed else 0
+    print(f"\nfirst request {args.delay:g} s after startup")
+    print(f"  {'step':<15} {'cold ms':>9} {'warm ms':>9}")
+    for step, seconds in cold["timings"].items():
+        print(f"  {step:<15} {seconds * 1000:>9.0f} {warm['timings'].get(step, 0) * 1000:>9.0f}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Vector store garbage collection: versions kept and partial builds swept.
+
+Lays out fake version directories in a temporary VECTOR_STORE_PATH and runs
+RAGPipeline's garbage collection for each VECTOR_STORE_KEEP_VERSIONS setting.
+Checks that:
+  - the newest KEEP versions and the current one survive, including when
+    fewer than KEEP versions exist on disk;
+  - KEEP=0 still keeps the current version;
+  - partial builds of this process and of dead processes are removed, and a
+    live process's build is kept.
+No index is built and no model is loaded. Exits non-zero on a failed check.
+
+    python benchmarks/vector_store_versions.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import rag.pipeline as pipeline  # noqa: E402
+
+# (versions on disk, current, KEEP, expected survivors)
+CASES = [
+    (["v1", "v2"], "v2", 3, ["v1", "v2"]),
+    (["v1", "v2", "v3"], "v3", 5, ["v1", "v2", "v3"]),
+    (["v1", "v2", "v3", "v4"], "v4", 5, ["v1", "v2", "v3", "v4"]),
+    (["v1", "v2", "v3", "v4"], "v4", 2, ["v3", "v4"]),
+    (["v1", "v2", "v3"], "v3", 1, ["v3"]),
+    (["v1", "v2", "v3"], "v3", 0, ["v3"]),
+    (["v1", "v2", "v3"], "v1", 1, ["v1", "v3"]),
+    (["v1"], "v1", 2, ["v1"]),
+]
+
+
+def _pipeline(root: Path) -> pipeline.RAGPipeline:
+    rag = object.__new__(pipeline.RAGPipeline)
+    rag.store_path = root
+    rag.versions_path = root / "versions"
+    rag.versions_path.mkdir(parents=True)
+    return rag
+
+
+def _survivors(rag: pipeline.RAGPipeline):
+    return sorted(p.name for p in rag.versions_path.iterdir())
+
+
+def main() -> int:
+    failed = False
+    print(f"{'on disk':<16} {'current':<8} {'keep':>4}  kept")
+    for versions, current, keep, expected in CASES:
+        with tempfile.TemporaryDirectory() as tmp:
+            rag = _pipeline(Path(tmp))
+            for name in versions:
+                (rag.versions_path / name).mkdir()
+            pipeline.VECTOR_STORE_KEEP_VERSIONS = keep
+            rag._collect_garbage(current)
+            kept = _survivors(rag)
+        ok = kept == expected
+        failed |= not ok
+        print(f"{','.join(versions):<16} {current:<8} {keep:>4}  {','.join(kept)}"
+              + ("" if ok else f"  FAIL: expected {','.join(expected)}"))
+
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    partials = {
+        f".v9.{os.getpid()}.partial": False,
+        f".v9.{dead.pid}.partial": False,
+        f".v9.{os.getppid()}.partial": True,
+        ".v9.partial": False,
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        rag = _pipeline(Path(tmp))
+        for name in partials:
+            (rag.versions_path / name).mkdir()
+        rag._sweep_partials()
+        left = set(_survivors(rag))
+    print("\npartial builds")
+    for name, should_stay in partials.items():
+        ok = (name in left) == should_stay
+        failed |= not ok
+        print(f"  {name:<24} {'kept' if name in left else 'removed'}" + ("" if ok else "  FAIL"))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
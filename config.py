@@ -32,13 +32,51 @@ GROQ_MODEL = _get("GROQ_MODEL", "llama-3.3-70b-versatile")
 DEEPSEEK_MODEL = _get("DEEPSEEK_MODEL", "deepseek-chat")
 LLM_MODEL = GROQ_MODEL if LLM_PROVIDER == "groq" else DEEPSEEK_MODEL
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_BACKEND = _get("EMBEDDING_BACKEND", "torch")
+EMBEDDING_THREADS = int(_get("EMBEDDING_THREADS", "0"))
+EMBEDDING_BATCH_SIZE = int(_get("EMBEDDING_BATCH_SIZE", "32"))
+ONNX_MODEL_DIR = _get("ONNX_MODEL_DIR", "./rag/onnx_model")
 OCR_CONFIDENCE_THRESHOLD = float(_get("OCR_CONFIDENCE_THRESHOLD", "0.6"))
+OCR_WARMUP = _get("OCR_WARMUP", "true").lower() in ("1", "true", "yes")
+OCR_MODE = _get("OCR_MODE", "sequential").lower()
+OCR_PREPROCESS = _get("OCR_PREPROCESS", "")
+OCR_TARGET_DPI = int(_get("OCR_TARGET_DPI", "300"))
+OCR_PAGE_WIDTH_IN = float(_get("OCR_PAGE_WIDTH_IN", "8.27"))
+OCR_WORKERS = int(_get("OCR_WORKERS", "0"))
+WARMUP_MODELS = _get("WARMUP_MODELS", "embeddings,ocr,asr,reranker")
+RESULT_CACHE_DIR = _get("RESULT_CACHE_DIR", "./.cache/results")
+RESULT_CACHE_SIZE = int(_get("RESULT_CACHE_SIZE", "512"))
 ASR_CONFIDENCE_THRESHOLD = float(_get("ASR_CONFIDENCE_THRESHOLD", "0.7"))
+WHISPER_MODEL_SIZE = _get("WHISPER_MODEL_SIZE", "base")
+ASR_CHUNK_SECONDS = float(_get("ASR_CHUNK_SECONDS", "30"))
+ASR_MIN_SILENCE_MS = int(_get("ASR_MIN_SILENCE_MS", "300"))
+ASR_WORKERS = int(_get("ASR_WORKERS", "1"))
 VERIFIER_CONFIDENCE_THRESHOLD = float(_get("VERIFIER_CONFIDENCE_THRESHOLD", "0.75"))
 MEMORY_DB_PATH = _get("MEMORY_DB_PATH", "./memory/memory.json")
+MEMORY_BACKEND = _get("MEMORY_BACKEND", "sqlite").lower()
+MEMORY_SIMILARITY = _get("MEMORY_SIMILARITY", "auto").lower()
+MEMORY_SIMILARITY_THRESHOLD = float(_get("MEMORY_SIMILARITY_THRESHOLD", "0.5"))
+MEMORY_INDEX_SAVE_EVERY = int(_get("MEMORY_INDEX_SAVE_EVERY", "1024"))
+MEMORY_MINHASH_BANDS = int(_get("MEMORY_MINHASH_BANDS", "16"))
+MEMORY_MINHASH_ROWS = int(_get("MEMORY_MINHASH_ROWS", "2"))
+MEMORY_MINHASH_MAX_CANDIDATES = int(_get("MEMORY_MINHASH_MAX_CANDIDATES", "200"))
+MEMORY_CORRECTION_LIMIT = int(_get("MEMORY_CORRECTION_LIMIT", "200"))
 VECTOR_STORE_PATH = _get("VECTOR_STORE_PATH", "./rag/vector_store")
+VECTOR_STORE_KEEP_VERSIONS = int(_get("VECTOR_STORE_KEEP_VERSIONS", "2"))
 KNOWLEDGE_BASE_PATH = _get("KNOWLEDGE_BASE_PATH", "./knowledge_base")
 TOP_K_RETRIEVAL = 5
+RAG_INDEX_TYPE = _get("RAG_INDEX_TYPE", "flat")
+RAG_HNSW_M = int(_get("RAG_HNSW_M", "32"))
+RAG_HNSW_EF_SEARCH = int(_get("RAG_HNSW_EF_SEARCH", "64"))
+RAG_TOPIC_MIN_SCORE = float(_get("RAG_TOPIC_MIN_SCORE", "0.45"))
+RAG_MMR_LAMBDA = float(_get("RAG_MMR_LAMBDA", "0.7"))
+RAG_MMR_FETCH_FACTOR = int(_get("RAG_MMR_FETCH_FACTOR", "3"))
+RAG_CONTEXT_MAX_CHARS = int(_get("RAG_CONTEXT_MAX_CHARS", "2400"))
+RAG_RERANK_ENABLED = _get("RAG_RERANK_ENABLED", "false").lower() in ("1", "true", "yes")
+RAG_RERANK_MODEL = _get("RAG_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RAG_RERANK_FETCH_K = int(_get("RAG_RERANK_FETCH_K", "20"))
+RAG_RERANK_BUDGET_MS = float(_get("RAG_RERANK_BUDGET_MS", "150"))
+RAG_RERANK_CACHE_SIZE = int(_get("RAG_RERANK_CACHE_SIZE", "4096"))
 
 Path(MEMORY_DB_PATH).parent.mkdir(parents=True, exist_ok=True)
 Path(VECTOR_STORE_PATH).mkdir(parents=True, exist_ok=True)
\ No newline at end of file
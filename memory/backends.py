@@ -0,0 +1,367 @@
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from memory.locking import file_lock
+
+
+def _atomic_write_json(path: Path, data):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _file_state(path: Path) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+# Every backend supports several processes sharing one file: writes are
+# serialized (a lock file, or SQLite's own locking), and poll() returns the
+# records other processes added or changed since this process last looked.
+
+# Original single-document format: every write rewrites the whole file.
+class JSONBackend:
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock_path = path.with_name(path.name + ".lock")
+        self.records: List[Dict] = []
+        self._by_id: Dict[str, Dict] = {}
+        self._state = None
+        self._pending: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _read(self):
+        self.records = []
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.records = json.load(f)
+        self._by_id = {r["id"]: r for r in self.records}
+        self._state = _file_state(self.path)
+
+    def _catch_up(self):
+        if _file_state(self.path) == self._state:
+            return
+        known = {r["id"]: (r.get("user_feedback"), r.get("reviewer_comment")) for r in self.records}
+        self._read()
+        for record in self.records:
+            if known.get(record["id"]) != (record.get("user_feedback"), record.get("reviewer_comment")):
+                self._pending[record["id"]] = record
+
+    def load(self) -> List[Dict]:
+        with self._lock, file_lock(self.lock_path):
+            self._read()
+        return [dict(r) for r in self.records]
+
+    def poll(self) -> List[Dict]:
+        with self._lock:
+            if _file_state(self.path) != self._state:
+                with file_lock(self.lock_path):
+                    self._catch_up()
+            changed = [dict(r) for r in self._pending.values()]
+            self._pending = {}
+        return changed
+
+    def get(self, record_id: str) -> Optional[Dict]:
+        return self._by_id.get(record_id)
+
+    def append(self, record: Dict):
+        with self._lock, file_lock(self.lock_path):
+            self._catch_up()
+            record = dict(record)
+            self.records.append(record)
+            self._by_id[record["id"]] = record
+            _atomic_write_json(self.path, self.records)
+            self._state = _file_state(self.path)
+
+    def update(self, record_id: str, fields: Dict):
+        with self._lock, file_lock(self.lock_path):
+            self._catch_up()
+            record = self._by_id.get(record_id)
+            if record is not None:
+                record.update(fields)
+                _atomic_write_json(self.path, self.records)
+                self._state = _file_state(self.path)
+
+    def close(self):
+        pass
+
+
+# Append-only operation log, compacted on load once stale operations dominate.
+# Appends and compaction hold the lock file; readers only ever consume whole
+# lines, so tailing the log needs no lock.
+class JSONLBackend:
+    def __init__(self, path: Path, compact_ratio: float = 2.0):
+        self.path = path
+        self.lock_path = path.with_name(path.name + ".lock")
+        self.compact_ratio = compact_ratio
+        self._records: Dict[str, Dict] = {}
+        self._ops = 0
+        self._inode = None
+        self._offset = 0
+        self._pending: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _apply(self, op: Dict) -> Optional[str]:
+        if op.get("op") == "put":
+            record = op["record"]
+            self._records[record["id"]] = record
+            return record["id"]
+        if op.get("op") == "update" and op.get("id") in self._records:
+            self._records[op["id"]].update(op.get("fields", {}))
+            return op["id"]
+        return None
+
+    def _read_from(self, offset: int) -> Tuple[List[str], int]:
+        changed = []
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    op = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                record_id = self._apply(op)
+                if record_id:
+                    changed.append(record_id)
+                self._ops += 1
+                offset += len(line)
+        return changed, offset
+
+    def _catch_up(self):
+        state = _file_state(self.path)
+        if state is None:
+            return
+        inode, size, _ = state
+        if inode != self._inode or size < self._offset:
+            # Another process compacted the log: re-read it from the start.
+            self._records, self._ops = {}, 0
+            self._inode = inode
+            _, self._offset = self._read_from(0)
+            self._pending.update(self._records)
+        elif size > self._offset:
+            changed, self._offset = self._read_from(self._offset)
+            self._pending.update({record_id: self._records[record_id] for record_id in changed})
+
+    def load(self) -> List[Dict]:
+        with self._lock, file_lock(self.lock_path):
+            self._records, self._ops, self._offset = {}, 0, 0
+            if self.path.exists():
+                self._inode = self.path.stat().st_ino
+                _, good = self._read_from(0)
+                if good < self.path.stat().st_size:
+                    # A torn final line from a crash mid-append; drop it so later appends start clean.
+                    with open(self.path, "r+b") as f:
+                        f.truncate(good)
+                self._offset = good
+            if self._ops > self.compact_ratio * len(self._records) + 100:
+                self.compact()
+            self._pending = {}
+        return [dict(r) for r in self._records.values()]
+
+    def poll(self) -> List[Dict]:
+        with self._lock:
+            self._catch_up()
+            changed = [dict(r) for r in self._pending.values()]
+            self._pending = {}
+        return changed
+
+    def get(self, record_id: str) -> Optional[Dict]:
+        return self._records.get(record_id)
+
+    def _write(self, op: Dict):
+        line = (json.dumps(op, ensure_ascii=False) + "\n").encode("utf-8")
+        with open(self.path, "ab") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self._ops += 1
+        self._offset += len(line)
+        self._inode = self.path.stat().st_ino
+
+    def append(self, record: Dict):
+        with self._lock, file_lock(self.lock_path):
+            self._catch_up()
+            self._records[record["id"]] = dict(record)
+            self._write({"op": "put", "record": record})
+
+    def update(self, record_id: str, fields: Dict):
+        with self._lock, file_lock(self.lock_path):
+            self._catch_up()
+            if record_id in self._records:
+                self._records[record_id].update(fields)
+                self._write({"op": "update", "id": record_id, "fields": fields})
+
+    def is_empty(self) -> bool:
+        return not self.path.exists() or self.path.stat().st_size == 0
+
+    def import_records(self, records: List[Dict]):
+        with self._lock, file_lock(self.lock_path):
+            self._records = {r["id"]: r for r in records}
+            self.compact()
+
+    def compact(self):
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for record in self._records.values():
+                f.write(json.dumps({"op": "put", "record": record}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._ops = len(self._records)
+        self._inode = self.path.stat().st_ino
+        self._offset = self.path.stat().st_size
+
+    def close(self):
+        pass
+
+
+# One row per record in a WAL-mode database; appends and updates touch a single
+# row. Every write stamps the row with the next rev, so poll() only has to read
+# rows past the last rev it saw, and only when PRAGMA data_version says another
+# connection committed.
+class SQLiteBackend:
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " id TEXT NOT NULL UNIQUE,"
+            " timestamp TEXT,"
+            " input_type TEXT,"
+            " user_feedback TEXT,"
+            " data TEXT NOT NULL,"
+            " rev INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(records)")]
+        if "rev" not in columns:
+            self._conn.execute("ALTER TABLE records ADD COLUMN rev INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS records_rev ON records (rev)")
+        self._last_rev = 0
+        self._data_version = None
+
+    def _transaction(self, fn):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn()
+                self._conn.execute("COMMIT")
+                return result
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _next_rev(self) -> int:
+        return self._conn.execute("SELECT COALESCE(MAX(rev), 0) + 1 FROM records").fetchone()[0]
+
+    def load(self) -> List[Dict]:
+        with self._lock:
+            self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            rows = self._conn.execute("SELECT data, rev FROM records ORDER BY seq").fetchall()
+        self._last_rev = max((rev for _, rev in rows), default=0)
+        return [json.loads(data) for data, _ in rows]
+
+    def poll(self) -> List[Dict]:
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return []
+            self._data_version = version
+            rows = self._conn.execute(
+                "SELECT data, rev FROM records WHERE rev > ? ORDER BY seq", (self._last_rev,)
+            ).fetchall()
+        if rows:
+            self._last_rev = max(self._last_rev, max(rev for _, rev in rows))
+        return [json.loads(data) for data, _ in rows]
+
+    def get(self, record_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM records WHERE id = ?", (record_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _insert(self, record: Dict, rev: int):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO records (id, timestamp, input_type, user_feedback, data, rev)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                record["id"],
+                record.get("timestamp"),
+                record.get("input_type"),
+                record.get("user_feedback"),
+                json.dumps(record, ensure_ascii=False),
+                rev,
+            ),
+        )
+
+    def append(self, record: Dict):
+        self._transaction(lambda: self._insert(record, self._next_rev()))
+
+    def update(self, record_id: str, fields: Dict):
+        def run():
+            row = self._conn.execute("SELECT data FROM records WHERE id = ?", (record_id,)).fetchone()
+            if row:
+                record = json.loads(row[0])
+                record.update(fields)
+                self._conn.execute(
+                    "UPDATE records SET user_feedback = ?, data = ?, rev = ? WHERE id = ?",
+                    (record.get("user_feedback"), json.dumps(record, ensure_ascii=False), self._next_rev(), record_id),
+                )
+        self._transaction(run)
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM records LIMIT 1").fetchone() is None
+
+    def import_records(self, records: List[Dict]):
+        def run():
+            rev = self._next_rev()
+            for record in records:
+                self._insert(record, rev)
+        self._transaction(run)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+BACKENDS = {"json": (JSONBackend, ".json"), "jsonl": (JSONLBackend, ".jsonl"), "sqlite": (SQLiteBackend, ".sqlite3")}
+
+
+def create_backend(name: str, db_path: Path, transform: Optional[Callable[[Dict], Dict]] = None):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown MEMORY_BACKEND '{name}'. Use one of: {', '.join(BACKENDS)}.")
+    cls, suffix = BACKENDS[name]
+    backend = cls(db_path.with_suffix(suffix))
+    legacy = db_path.with_suffix(".json")
+    if name != "json" and legacy.exists():
+        # Processes starting together must not both import the legacy file.
+        with file_lock(db_path.with_name(db_path.name + ".migrate.lock")):
+            if legacy.exists() and backend.is_empty():
+                migrate_from_json(legacy, backend, transform)
+    return backend
+
+
+# The import is a single transaction (SQLite) or an atomic file replace (JSONL),
+# so a crash part-way leaves the backend empty and the migration simply reruns.
+def migrate_from_json(legacy: Path, backend, transform: Optional[Callable[[Dict], Dict]] = None):
+    with open(legacy, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    if transform is not None:
+        records = [transform(r) for r in records]
+    backend.import_records(records)
+    legacy.rename(legacy.with_name(legacy.name + ".migrated"))
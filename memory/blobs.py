@@ -0,0 +1,41 @@
+import hashlib
+import os
+import uuid
+import zlib
+from pathlib import Path
+from typing import Optional
+
+
+# Content-addressed, zlib-compressed text blobs: the key is the SHA-256 of the
+# text, so identical explanations or contexts are stored once. Files are never
+# rewritten, which keeps them safe to read while another process is writing.
+class BlobStore:
+    def __init__(self, root: Path):
+        self.root = root
+
+    @staticmethod
+    def key_for(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key[2:]
+
+    def put(self, text: str) -> str:
+        key = self.key_for(text)
+        path = self._path(key)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+            with open(tmp, "wb") as f:
+                f.write(zlib.compress(text.encode("utf-8"), 6))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        return key
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return zlib.decompress(f.read()).decode("utf-8")
+        except (OSError, zlib.error):
+            return None
@@ -0,0 +1,176 @@
+import base64
+import hashlib
+import re
+from pathlib import Path
+from typing import Dict, FrozenSet, List
+
+import numpy as np
+
+from config import MEMORY_MINHASH_BANDS, MEMORY_MINHASH_ROWS
+from memory.locking import file_lock
+
+_TOKEN_RE = re.compile(r"[a-z]+|\d+(?:\.\d+)?|[^\sa-z\d]")
+_MERSENNE = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_BAND_MULT = np.uint64(0x9E3779B97F4A7C15)
+
+# Words that appear in nearly every problem statement and say nothing about it.
+STOPWORDS = frozenset(
+    "a an and are as at be by find for from given how if in is it of on or "
+    "please show that the then to value what when where which with".split()
+)
+
+
+def tokenize(text: str) -> FrozenSet[str]:
+    # Words, numbers and single math symbols, so "x^2+1" and "x ^ 2 + 1" match.
+    return frozenset(t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS)
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _token_hash(token: str) -> int:
+    # Stable across processes, unlike hash().
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+class MinHasher:
+    def __init__(self, bands: int = MEMORY_MINHASH_BANDS, rows: int = MEMORY_MINHASH_ROWS, seed: int = 1):
+        self.bands = bands
+        self.rows = rows
+        self.num_perm = bands * rows
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 32, size=self.num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=self.num_perm, dtype=np.uint64)
+
+    def signature(self, tokens: FrozenSet[str]) -> np.ndarray:
+        if not tokens:
+            return np.full(self.num_perm, 0xFFFFFFFF, dtype=np.uint32)
+        hashes = np.fromiter((_token_hash(t) for t in tokens), dtype=np.uint64, count=len(tokens))
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    @staticmethod
+    def encode(signature: np.ndarray) -> str:
+        return base64.b64encode(signature.astype("<u4").tobytes()).decode("ascii")
+
+    def decode(self, value: str) -> np.ndarray:
+        signature = np.frombuffer(base64.b64decode(value), dtype="<u4")
+        if len(signature) != self.num_perm:
+            raise ValueError("MinHash signature was built with different bands/rows")
+        return signature.astype(np.uint32)
+
+    def band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        # (n, num_perm) -> (n, bands) uint64 keys; overflow wraps, which is fine for hashing.
+        grouped = signatures.reshape(-1, self.bands, self.rows).astype(np.uint64)
+        mults = _BAND_MULT ** np.arange(self.rows, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            return (grouped * mults).sum(axis=2, dtype=np.uint64)
+
+
+# Signatures of stored records, kept out of the record payload in a side file
+# next to the memory db, one "id<TAB>base64" line per record. Lines are
+# written newline-first, so a torn write spoils only its own line. The file
+# only saves re-signing on load: a record without a readable line (torn write,
+# other bands/rows) is signed again from its problem_text.
+class SignatureFile:
+    def __init__(self, db_path: Path, hasher: MinHasher):
+        base = db_path.with_suffix("")
+        self.path = base.with_name(base.name + ".minhash")
+        self.lock_path = base.with_name(base.name + ".minhash.lock")
+        self.hasher = hasher
+
+    def load(self) -> Dict[str, np.ndarray]:
+        if not self.path.exists():
+            return {}
+        with file_lock(self.lock_path):
+            data = self.path.read_bytes()
+        signatures = {}
+        for line in data.decode("utf-8", "replace").split("\n"):
+            record_id, _, value = line.partition("\t")
+            try:
+                signatures[record_id] = self.hasher.decode(value)
+            except ValueError:
+                continue
+        return signatures
+
+    def append(self, ids: List[str], signatures: List[np.ndarray]):
+        if not ids:
+            return
+        data = "".join(f"\n{i}\t{self.hasher.encode(s)}" for i, s in zip(ids, signatures))
+        with file_lock(self.lock_path), open(self.path, "ab") as f:
+            f.write(data.encode("utf-8"))
+
+
+# Locality-sensitive hashing over MinHash bands. Each band is a sorted array of
+# (key, position) pairs searched with searchsorted, plus a small dict of recent
+# additions that is merged into the sorted arrays once it grows past 1/8 of them.
+class MinHashLSH:
+    def __init__(self, hasher: MinHasher):
+        self.hasher = hasher
+        self.ids: List[str] = []
+        self._keys = [np.zeros(0, dtype=np.uint64) for _ in range(hasher.bands)]
+        self._positions = [np.zeros(0, dtype=np.int64) for _ in range(hasher.bands)]
+        self._recent: List[Dict[int, List[int]]] = [{} for _ in range(hasher.bands)]
+        self._recent_count = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add_many(self, ids: List[str], signatures: np.ndarray):
+        if not ids:
+            return
+        start = len(self.ids)
+        self.ids.extend(ids)
+        keys = self.hasher.band_keys(signatures)
+        positions = np.arange(start, start + len(ids), dtype=np.int64)
+        for band in range(self.hasher.bands):
+            self._keys[band] = np.concatenate([self._keys[band], keys[:, band]])
+            self._positions[band] = np.concatenate([self._positions[band], positions])
+            order = np.argsort(self._keys[band], kind="stable")
+            self._keys[band] = self._keys[band][order]
+            self._positions[band] = self._positions[band][order]
+
+    def add(self, record_id: str, signature: np.ndarray):
+        position = len(self.ids)
+        self.ids.append(record_id)
+        keys = self.hasher.band_keys(signature[None, :])[0]
+        for band, key in enumerate(keys):
+            self._recent[band].setdefault(int(key), []).append(position)
+        self._recent_count += 1
+        if self._recent_count > max(1024, len(self._keys[0]) // 8):
+            self._merge_recent()
+
+    def _merge_recent(self):
+        for band in range(self.hasher.bands):
+            keys = [k for k, members in self._recent[band].items() for _ in members]
+            positions = [p for members in self._recent[band].values() for p in members]
+            self._keys[band] = np.concatenate([self._keys[band], np.array(keys, dtype=np.uint64)])
+            self._positions[band] = np.concatenate([self._positions[band], np.array(positions, dtype=np.int64)])
+            order = np.argsort(self._keys[band], kind="stable")
+            self._keys[band] = self._keys[band][order]
+            self._positions[band] = self._positions[band][order]
+            self._recent[band] = {}
+        self._recent_count = 0
+
+    def query(self, signature: np.ndarray, max_candidates: int) -> List[str]:
+        keys = self.hasher.band_keys(signature[None, :])[0]
+        found = []
+        for band, key in enumerate(keys):
+            lo = np.searchsorted(self._keys[band], key, side="left")
+            hi = np.searchsorted(self._keys[band], key, side="right")
+            if hi > lo:
+                found.append(self._positions[band][lo:hi])
+            recent = self._recent[band].get(int(key))
+            if recent:
+                found.append(np.array(recent, dtype=np.int64))
+        if not found:
+            return []
+        # Candidates sharing more bands are likelier to be close; keep the best.
+        positions, counts = np.unique(np.concatenate(found), return_counts=True)
+        if len(positions) > max_candidates:
+            positions = positions[np.argsort(-counts, kind="stable")[:max_candidates]]
+        return [self.ids[p] for p in positions]
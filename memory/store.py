@@ -1,30 +1,242 @@
+import bisect
 import json
-import os
+import threading
 import uuid
+from collections import Counter, deque
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import Callable, List, Optional, Dict, Any
 from pathlib import Path
 
-from config import MEMORY_DB_PATH
+import numpy as np
+
+from config import (
+    MEMORY_DB_PATH,
+    MEMORY_BACKEND,
+    MEMORY_SIMILARITY,
+    MEMORY_SIMILARITY_THRESHOLD,
+    MEMORY_MINHASH_MAX_CANDIDATES,
+    MEMORY_CORRECTION_LIMIT,
+    EMBEDDING_MODEL,
+    EMBEDDING_BACKEND,
+)
+from memory.backends import create_backend
+from memory.blobs import BlobStore
+from memory.minhash import MinHasher, MinHashLSH, SignatureFile, jaccard, tokenize
+from memory.vector_index import MemoryVectorIndex
+
+TOPIC_BONUS = 0.2
+LEXICAL_THRESHOLD = 0.15
+# Explanations and verifier outputs longer than this go to the blob store.
+INLINE_LIMIT = 256
+# Records embedded per encode call while backfilling the vector index.
+BACKFILL_BATCH = 256
 
 
 class MemoryStore:
-    def __init__(self):
+    def __init__(self, chunk_resolver: Optional[Callable[[Dict], List[Dict]]] = None):
         self.db_path = Path(MEMORY_DB_PATH)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.blobs = BlobStore(self.db_path.with_name(self.db_path.stem + ".blobs"))
+        self.chunk_resolver = chunk_resolver
+        self.backend = create_backend(MEMORY_BACKEND, self.db_path, transform=self._compact)
         self.records: List[Dict] = []
-        self._load()
+        self._by_id: Dict[str, Dict] = {}
+        self._seq: Dict[str, int] = {}
+        self._feedback_counts: Counter = Counter()
+        self._corrections: Dict[str, deque] = {}
+        self._correction_versions: Counter = Counter()
+        for record in self.backend.load():
+            self._index_record(record)
+        self.vector_index: Optional[MemoryVectorIndex] = None
+        self.minhasher = MinHasher()
+        self.signatures = SignatureFile(self.db_path, self.minhasher)
+        self.lsh: Optional[MinHashLSH] = None
+        self._encoder_failed = MEMORY_SIMILARITY in ("lexical", "minhash")
+        self._index_lock = threading.Lock()
+        self._backfill: Optional[threading.Thread] = None
+        self._backfill_lock = threading.Lock()
+
+    # Secondary indexes kept current on every write, so id lookups, stats and
+    # correction patterns never scan the history.
+    def _index_record(self, record: Dict):
+        self._seq[record["id"]] = len(self.records)
+        self.records.append(record)
+        self._by_id[record["id"]] = record
+        self._feedback_counts[record.get("user_feedback")] += 1
+        if record.get("reviewer_comment"):
+            self._add_correction(record)
+
+    def _add_correction(self, record: Dict):
+        input_type = record.get("input_type")
+        patterns = self._corrections.setdefault(input_type, deque(maxlen=MEMORY_CORRECTION_LIMIT))
+        entry = (self._seq[record["id"]], record["id"])
+        if entry in patterns:
+            # Same record, possibly a new comment.
+            self._correction_versions[input_type] += 1
+            return
+        # Ordered by record sequence, like the original scan, even when an old
+        # record receives its comment late.
+        if len(patterns) == patterns.maxlen:
+            if entry < patterns[0]:
+                return
+            patterns.popleft()
+        patterns.insert(bisect.bisect(patterns, entry), entry)
+        self._correction_versions[input_type] += 1
+
+    def _drop_correction(self, record: Dict):
+        input_type = record.get("input_type")
+        patterns = self._corrections.get(input_type)
+        entry = (self._seq[record["id"]], record["id"])
+        if not patterns or entry not in patterns:
+            return
+        # An older record may now fall inside the window; rare enough to rescan.
+        patterns.clear()
+        for other in reversed(self.records):
+            if len(patterns) == patterns.maxlen:
+                break
+            if other.get("input_type") == input_type and other.get("reviewer_comment"):
+                patterns.appendleft((self._seq[other["id"]], other["id"]))
+        self._correction_versions[input_type] += 1
+
+    @staticmethod
+    def _problem_text(record: Dict) -> str:
+        return (record.get("parsed_question") or {}).get("problem_text", "")
+
+    @staticmethod
+    def _topic(record: Dict) -> str:
+        return (record.get("parsed_question") or {}).get("topic", "")
+
+    # None while the embedder is still loading in the background; similarity
+    # search uses MinHash until it is ready. The backfill thread waits for it.
+    def _encoder(self, wait: bool = False):
+        if self._encoder_failed:
+            return None
+        try:
+            from rag.pipeline import get_embed_model
+            return get_embed_model(wait=wait)
+        except Exception:
+            self._encoder_failed = True
+            return None
+
+    # None until the background backfill has published the index; the first
+    # call starts it, so MemoryStore() stays cheap and searches never wait.
+    def _ensure_vector_index(self) -> Optional[MemoryVectorIndex]:
+        if self.vector_index is None and not self._encoder_failed:
+            self.start_vector_backfill()
+        return self.vector_index
+
+    # Starts the backfill once per store, from find_similar or the warm-up
+    # manager, and returns its thread (None when embeddings are off).
+    def start_vector_backfill(self) -> Optional[threading.Thread]:
+        with self._backfill_lock:
+            if self._backfill is None and self.vector_index is None and not self._encoder_failed:
+                self._backfill = threading.Thread(target=self._backfill_vectors, name="memory-backfill", daemon=True)
+                self._backfill.start()
+            return self._backfill
+
+    # Blocking form for the warm-up manager, which reports the build time.
+    def build_vector_index(self) -> MemoryVectorIndex:
+        thread = self.start_vector_backfill()
+        if thread is not None:
+            thread.join()
+        if self.vector_index is None:
+            raise RuntimeError("no embedder; similar-problem search uses MinHash")
+        return self.vector_index
+
+    # Records stored before the index existed (or by the lexical path) are
+    # embedded in batches without holding _index_lock, so stores and feedback
+    # carry on meanwhile. Records that arrive during a pass are picked up by
+    # the next one; the last small delta is embedded under the lock, together
+    # with publishing the index, so none is missed.
+    def _backfill_vectors(self):
+        try:
+            encoder = self._encoder(wait=True)
+            if encoder is None:
+                return
+            index = MemoryVectorIndex(self.db_path, f"{EMBEDDING_MODEL}/{EMBEDDING_BACKEND}")
+            index.load(encoder.dim)
+            while True:
+                with self._index_lock:
+                    index.sync()
+                    missing = [r for r in self.records if r["id"] not in index.positions and self._problem_text(r)]
+                    if len(missing) <= BACKFILL_BATCH:
+                        self._embed(index, encoder, missing)
+                        index.set_metadata(self.records)
+                        self.vector_index = index
+                        return
+                for start in range(0, len(missing), BACKFILL_BATCH):
+                    self._embed(index, encoder, missing[start:start + BACKFILL_BATCH])
+        except Exception:
+            # Searches stay on MinHash for the life of this store.
+            self._encoder_failed = True
+
+    def _embed(self, index: MemoryVectorIndex, encoder, records: List[Dict]):
+        if records:
+            index.add(
+                [r["id"] for r in records],
+                encoder.encode([self._problem_text(r) for r in records]),
+                [self._topic(r) for r in records],
+            )
+
+    # Signature from the side file, from the record itself (records written
+    # before signatures moved out of the payload), or computed from the text.
+    def _signature(self, record: Dict, known: Optional[Dict[str, np.ndarray]] = None) -> np.ndarray:
+        if known and record["id"] in known:
+            return known[record["id"]]
+        value = record.get("minhash")
+        if value:
+            try:
+                return self.minhasher.decode(value)
+            except ValueError:
+                pass
+        return self.minhasher.signature(tokenize(self._problem_text(record)))
+
+    def _ensure_lsh(self) -> MinHashLSH:
+        with self._index_lock:
+            if self.lsh is None:
+                lsh = MinHashLSH(self.minhasher)
+                indexed = [r for r in self.records if self._problem_text(r)]
+                if indexed:
+                    known = self.signatures.load()
+                    signatures = [self._signature(r, known) for r in indexed]
+                    unsaved = [i for i, r in enumerate(indexed) if r["id"] not in known]
+                    self.signatures.append([indexed[i]["id"] for i in unsaved], [signatures[i] for i in unsaved])
+                    lsh.add_many([r["id"] for r in indexed], np.stack(signatures))
+                self.lsh = lsh
+        return self.lsh
 
-    def _load(self):
-        if self.db_path.exists():
-            with open(self.db_path, "r", encoding="utf-8") as f:
-                self.records = json.load(f)
-        else:
-            self.records = []
+    # Records keep only what lookups need inline. Retrieved chunks become
+    # references into the RAG index (see RAGPipeline.chunk_refs); long text goes
+    # to the blob store. hydrate() reverses both.
+    def _compact(self, record: Dict) -> Dict:
+        record = dict(record)
+        context = record.pop("retrieved_context", None)
+        if isinstance(context, dict) and "index_version" in context:
+            record["context_refs"] = context
+        elif context:
+            record["context_blob"] = self.blobs.put(json.dumps(context, ensure_ascii=False))
+        explanation = record.get("explanation") or ""
+        if len(explanation) > INLINE_LIMIT:
+            record["explanation_blob"] = self.blobs.put(record.pop("explanation"))
+        outcome = record.get("verifier_outcome") or {}
+        outcome_json = json.dumps(outcome, ensure_ascii=False)
+        if len(outcome_json) > INLINE_LIMIT:
+            record["verifier_blob"] = self.blobs.put(outcome_json)
+            record["verifier_outcome"] = {k: outcome.get(k) for k in ("is_correct", "confidence") if k in outcome}
+        return record
 
-    def _save(self):
-        with open(self.db_path, "w", encoding="utf-8") as f:
-            json.dump(self.records, f, indent=2, ensure_ascii=False)
+    def hydrate(self, record: Dict) -> Dict:
+        full = dict(record)
+        if "context_refs" in full:
+            refs = full.pop("context_refs")
+            full["retrieved_context"] = self.chunk_resolver(refs) if self.chunk_resolver else []
+        elif "context_blob" in full:
+            full["retrieved_context"] = json.loads(self.blobs.get(full.pop("context_blob")) or "[]")
+        if "explanation_blob" in full:
+            full["explanation"] = self.blobs.get(full.pop("explanation_blob")) or ""
+        if "verifier_blob" in full:
+            full["verifier_outcome"] = json.loads(self.blobs.get(full.pop("verifier_blob")) or "{}")
+        return full
 
     def store(
         self,
@@ -52,20 +264,116 @@ class MemoryStore:
             "user_feedback": user_feedback,
             "reviewer_comment": reviewer_comment,
         }
-        self.records.append(record)
-        self._save()
+        record = self._compact(record)
+        signature = self.minhasher.signature(tokenize(self._problem_text(record)))
+        self.backend.append(record)
+        self.signatures.append([record_id], [signature])
+        # Under the index lock so a concurrent first-use index build sees each
+        # record exactly once. Records other processes wrote first are applied
+        # first, keeping the in-memory order the same as the file order.
+        with self._index_lock:
+            self._apply_changes(self.backend.poll())
+            if record_id not in self._by_id:
+                self._index_record(record)
+                self._add_to_indexes([record], {record_id: signature})
         return record_id
 
+    def _add_to_indexes(self, records: List[Dict], signatures: Optional[Dict[str, np.ndarray]] = None):
+        records = [r for r in records if self._problem_text(r)]
+        if not records:
+            return
+        if self.lsh is not None:
+            for record in records:
+                self.lsh.add(record["id"], self._signature(record, signatures))
+        if self.vector_index is not None:
+            index = self.vector_index
+            index.sync()
+            missing = [r for r in records if r["id"] not in index.positions]
+            self._embed(index, self._encoder(), missing)
+            index.set_metadata(records)
+
+    def _apply_feedback(self, record: Dict, feedback: Optional[str], comment: str):
+        self._feedback_counts[record.get("user_feedback")] -= 1
+        self._feedback_counts[feedback] += 1
+        had_comment = bool(record.get("reviewer_comment"))
+        record.update({"user_feedback": feedback, "reviewer_comment": comment})
+        if had_comment and not comment:
+            self._drop_correction(record)
+        elif comment:
+            self._add_correction(record)
+        if self.vector_index is not None:
+            self.vector_index.set_excluded(record["id"], feedback == "incorrect")
+
+    def _apply_changes(self, records: List[Dict]):
+        added = []
+        for record in records:
+            mine = self._by_id.get(record["id"])
+            if mine is None:
+                self._index_record(record)
+                added.append(record)
+            elif (mine.get("user_feedback"), mine.get("reviewer_comment")) != (
+                record.get("user_feedback"), record.get("reviewer_comment")
+            ):
+                self._apply_feedback(mine, record.get("user_feedback"), record.get("reviewer_comment") or "")
+        self._add_to_indexes(added)
+
+    # Picks up records stored or re-labelled by other processes sharing the db.
+    def refresh(self):
+        changes = self.backend.poll()
+        if changes:
+            with self._index_lock:
+                self._apply_changes(changes)
+
     def update_feedback(self, record_id: str, feedback: str, comment: str = ""):
-        for record in self.records:
-            if record["id"] == record_id:
-                record["user_feedback"] = feedback
-                record["reviewer_comment"] = comment
-                self._save()
-                return True
-        return False
+        self.refresh()
+        record = self._by_id.get(record_id)
+        if record is None:
+            return False
+        self.backend.update(record_id, {"user_feedback": feedback, "reviewer_comment": comment})
+        with self._index_lock:
+            self._apply_feedback(record, feedback, comment)
+        return True
+
+    def get_record(self, record_id: str) -> Optional[Dict]:
+        self.refresh()
+        return self._by_id.get(record_id)
 
     def find_similar(self, problem_text: str, topic: str, top_k: int = 3) -> List[Dict]:
+        self.refresh()
+        if MEMORY_SIMILARITY == "lexical" or not problem_text:
+            return self._find_similar_lexical(problem_text, topic, top_k)
+        index = self._ensure_vector_index()
+        if index is None:
+            return self._find_similar_minhash(problem_text, topic, top_k)
+        query = self._encoder().encode([problem_text])[0]
+        # Same-topic neighbours get the topic bonus, so search that partition as
+        # well as the whole history and keep the best score per record.
+        scores: Dict[str, float] = {}
+        for record_id, score in index.search(query, top_k, topic=topic or None) + index.search(query, top_k):
+            if score >= MEMORY_SIMILARITY_THRESHOLD and record_id in self._by_id:
+                bonus = TOPIC_BONUS if self._topic(self._by_id[record_id]) == topic else 0
+                scores[record_id] = max(scores.get(record_id, 0), score + bonus)
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        return [self._by_id[record_id] for record_id, _ in ranked[:top_k]]
+
+    # Without an encoder: LSH narrows the history to records sharing MinHash bands,
+    # and only those candidates are scored with exact Jaccard over math tokens.
+    def _find_similar_minhash(self, problem_text: str, topic: str, top_k: int = 3) -> List[Dict]:
+        lsh = self._ensure_lsh()
+        tokens = tokenize(problem_text)
+        scored = []
+        for record_id in lsh.query(self.minhasher.signature(tokens), MEMORY_MINHASH_MAX_CANDIDATES):
+            record = self._by_id.get(record_id)
+            if record is None or record.get("user_feedback") == "incorrect":
+                continue
+            score = jaccard(tokens, tokenize(self._problem_text(record)))
+            score += TOPIC_BONUS if self._topic(record) == topic else 0
+            if score > LEXICAL_THRESHOLD:
+                scored.append((score, record))
+        scored.sort(key=lambda x: x[0], reverse=True)
+        return [r for _, r in scored[:top_k]]
+
+    def _find_similar_lexical(self, problem_text: str, topic: str, top_k: int = 3) -> List[Dict]:
         scored = []
         problem_words = set(problem_text.lower().split())
         for record in self.records:
@@ -79,29 +387,38 @@ class MemoryStore:
             intersection = problem_words & rec_words
             union = problem_words | rec_words
             jaccard = len(intersection) / len(union) if union else 0
-            topic_bonus = 0.2 if rec_topic == topic else 0
+            topic_bonus = TOPIC_BONUS if rec_topic == topic else 0
             score = jaccard + topic_bonus
-            if score > 0.15:
+            if score > LEXICAL_THRESHOLD:
                 scored.append((score, record))
         scored.sort(key=lambda x: x[0], reverse=True)
         return [r for _, r in scored[:top_k]]
 
+    # Changes whenever get_correction_patterns(input_type) would return
+    # something different, so callers can cache whatever they build from it.
+    def correction_version(self, input_type: str) -> int:
+        self.refresh()
+        return self._correction_versions[input_type]
+
     def get_correction_patterns(self, input_type: str) -> List[Dict]:
+        self.refresh()
         patterns = []
-        for record in self.records:
-            if record.get("input_type") == input_type and record.get("reviewer_comment"):
-                patterns.append({
-                    "original": record.get("raw_input", ""),
-                    "correction": record.get("reviewer_comment", ""),
-                    "parsed": record.get("parsed_question", {}),
-                })
-        return patterns[-10:]
+        for _, record_id in self._corrections.get(input_type, ()):
+            record = self._by_id[record_id]
+            patterns.append({
+                "original": record.get("raw_input", ""),
+                "correction": record.get("reviewer_comment", ""),
+                "parsed": record.get("parsed_question", {}),
+            })
+        return patterns
 
     def get_all_records(self) -> List[Dict]:
+        self.refresh()
         return self.records
 
     def get_stats(self) -> Dict:
+        self.refresh()
         total = len(self.records)
-        correct = sum(1 for r in self.records if r.get("user_feedback") == "correct")
-        incorrect = sum(1 for r in self.records if r.get("user_feedback") == "incorrect")
+        correct = self._feedback_counts["correct"]
+        incorrect = self._feedback_counts["incorrect"]
         return {"total": total, "correct": correct, "incorrect": incorrect, "pending": total - correct - incorrect}
\ No newline at end of file
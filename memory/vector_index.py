@@ -0,0 +1,234 @@
+import importlib.util
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import RAG_HNSW_M, RAG_HNSW_EF_SEARCH, MEMORY_INDEX_SAVE_EVERY
+from memory.locking import file_lock
+
+FAISS_AVAILABLE = importlib.util.find_spec("faiss") is not None
+
+
+def _faiss():
+    import faiss
+    return faiss
+
+
+# Normalized problem_text embeddings for MemoryStore records. Vectors and ids are
+# appended to flat files next to the memory db, so a store costs one encode and
+# two small appends. With faiss installed, search runs on an HNSW graph whose
+# snapshot is saved every MEMORY_INDEX_SAVE_EVERY additions; topic and feedback
+# filters are applied inside the graph search through a bitmap selector.
+# Without faiss the same filters are applied to an exact dot product.
+class MemoryVectorIndex:
+    def __init__(self, db_path: Path, model_name: str):
+        base = db_path.with_suffix("")
+        self.vec_path = base.with_name(base.name + ".vectors.f32")
+        self.ids_path = base.with_name(base.name + ".vectors.ids")
+        self.meta_path = base.with_name(base.name + ".vectors.json")
+        self.graph_path = base.with_name(base.name + ".vectors.hnsw")
+        self.lock_path = base.with_name(base.name + ".vectors.lock")
+        self._ids_offset = 0
+        self.model_name = model_name
+        self.dim = 0
+        self.ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._topics = np.zeros(0, dtype=np.int32)
+        self._excluded = np.zeros(0, dtype=bool)
+        self._topic_codes: Dict[str, int] = {}
+        self._graph = None
+        self._graph_saved = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _reset_files(self):
+        for path in (self.vec_path, self.ids_path, self.graph_path):
+            if path.exists():
+                path.unlink()
+        self.meta_path.write_text(json.dumps({"model": self.model_name, "dim": self.dim}), encoding="utf-8")
+
+    def load(self, dim: int):
+        self.dim = dim
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        with file_lock(self.lock_path):
+            meta = {}
+            if self.meta_path.exists():
+                meta = json.loads(self.meta_path.read_text(encoding="utf-8"))
+            if meta.get("model") != self.model_name or meta.get("dim") != dim:
+                self._reset_files()
+                return
+            ids = []
+            if self.ids_path.exists():
+                ids = [line for line in self.ids_path.read_text(encoding="utf-8").split("\n") if line]
+            rows = self.vec_path.stat().st_size // (4 * dim) if self.vec_path.exists() else 0
+            count = min(len(ids), rows)
+            if count < len(ids) or count < rows:
+                # A crash between the two appends; keep the consistent prefix.
+                vectors = np.fromfile(self.vec_path, dtype=np.float32, count=count * dim).reshape(count, dim)
+                self._reset_files()
+                if count:
+                    self._append_files(ids[:count], vectors)
+                self._ids_offset = 0
+            if FAISS_AVAILABLE and count and self.graph_path.exists():
+                graph = _faiss().read_index(str(self.graph_path))
+                if graph.d == dim and graph.ntotal <= count:
+                    self._graph = graph
+                    self._graph_saved = graph.ntotal
+            self._catch_up()
+            self._maybe_save_graph()
+
+    # Rows appended by other processes since this one last looked. Vectors are
+    # written before their ids, so every complete id line has its row; the file
+    # order is the same in every process, which keeps the saved graph valid.
+    def _catch_up(self):
+        if not self.ids_path.exists():
+            return
+        with open(self.ids_path, "rb") as f:
+            f.seek(self._ids_offset)
+            data = f.read()
+        data = data[:data.rfind(b"\n") + 1]
+        if not data:
+            return
+        ids = data.decode("utf-8").split("\n")[:-1]
+        start = len(self.ids)
+        rows = self.vec_path.stat().st_size // (4 * self.dim) - start if self.vec_path.exists() else 0
+        ids = ids[:max(0, rows)]
+        if not ids:
+            return
+        vectors = np.fromfile(
+            self.vec_path, dtype=np.float32, count=len(ids) * self.dim, offset=start * 4 * self.dim
+        ).reshape(len(ids), self.dim)
+        self._ids_offset += sum(len(i.encode("utf-8")) + 1 for i in ids)
+        self._add(ids, vectors, None)
+
+    def sync(self):
+        with self._lock:
+            self._catch_up()
+
+    def _append_files(self, ids: List[str], vectors: np.ndarray):
+        with open(self.vec_path, "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        data = "".join(i + "\n" for i in ids).encode("utf-8")
+        with open(self.ids_path, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._ids_offset += len(data)
+
+    def _maybe_save_graph(self):
+        if self._graph is None or self._graph.ntotal - self._graph_saved < MEMORY_INDEX_SAVE_EVERY:
+            return
+        tmp = self.graph_path.with_name(self.graph_path.name + ".tmp")
+        _faiss().write_index(self._graph, str(tmp))
+        os.replace(tmp, self.graph_path)
+        self._graph_saved = self._graph.ntotal
+
+    def _topic_code(self, topic: str) -> int:
+        if topic not in self._topic_codes:
+            self._topic_codes[topic] = len(self._topic_codes)
+        return self._topic_codes[topic]
+
+    def _grow(self, extra: int):
+        n = len(self.ids)
+        capacity = self._vectors.shape[0]
+        if n + extra <= capacity:
+            return
+        capacity = max(64, capacity * 2, n + extra)
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[:n] = self._vectors[:n]
+        topics = np.full(capacity, -1, dtype=np.int32)
+        topics[:n] = self._topics[:n]
+        excluded = np.zeros(capacity, dtype=bool)
+        excluded[:n] = self._excluded[:n]
+        self._vectors, self._topics, self._excluded = vectors, topics, excluded
+
+    def _add(self, ids: List[str], vectors: np.ndarray, topics: Optional[List[str]]):
+        self._grow(len(ids))
+        start = len(self.ids)
+        end = start + len(ids)
+        self._vectors[start:end] = vectors
+        if topics is not None:
+            self._topics[start:end] = [self._topic_code(t) for t in topics]
+        for offset, record_id in enumerate(ids):
+            self.positions[record_id] = start + offset
+        self.ids.extend(ids)
+        if FAISS_AVAILABLE:
+            if self._graph is None:
+                faiss = _faiss()
+                self._graph = faiss.IndexHNSWFlat(self.dim, RAG_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            # A loaded snapshot may already cover a prefix of these rows.
+            if self._graph.ntotal < end:
+                self._graph.add(self._vectors[self._graph.ntotal:end])
+
+    # Topics and feedback live in the records, not the vector files, so they are
+    # applied after load.
+    def set_metadata(self, records: List[Dict]):
+        with self._lock:
+            for record in records:
+                pos = self.positions.get(record["id"])
+                if pos is None:
+                    continue
+                self._topics[pos] = self._topic_code((record.get("parsed_question") or {}).get("topic", ""))
+                self._excluded[pos] = record.get("user_feedback") == "incorrect"
+
+    def add(self, ids: List[str], vectors: np.ndarray, topics: List[str]):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        with self._lock, file_lock(self.lock_path):
+            self._catch_up()
+            keep = [i for i, record_id in enumerate(ids) if record_id not in self.positions]
+            if not keep:
+                return
+            ids, vectors, topics = [ids[i] for i in keep], vectors[keep], [topics[i] for i in keep]
+            self._append_files(ids, vectors)
+            self._add(ids, vectors, topics)
+            self._maybe_save_graph()
+
+    def set_excluded(self, record_id: str, excluded: bool):
+        pos = self.positions.get(record_id)
+        if pos is not None:
+            self._excluded[pos] = excluded
+
+    def _exact(self, query: np.ndarray, top_k: int, allowed: np.ndarray) -> List[Tuple[int, float]]:
+        scores = np.where(allowed, self._vectors[:len(allowed)] @ query, -np.inf)
+        k = min(top_k, int(allowed.sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def _graph_search(self, query: np.ndarray, top_k: int, allowed: np.ndarray) -> List[Tuple[int, float]]:
+        faiss = _faiss()
+        bits = np.packbits(allowed, bitorder="little")
+        params = faiss.SearchParametersHNSW(
+            sel=faiss.IDSelectorBitmap(len(allowed), faiss.swig_ptr(bits)),
+            efSearch=max(RAG_HNSW_EF_SEARCH, top_k),
+        )
+        scores, idxs = self._graph.search(query.reshape(1, -1), top_k, params=params)
+        return [(int(i), float(s)) for i, s in zip(idxs[0], scores[0]) if i >= 0]
+
+    def search(self, query: np.ndarray, top_k: int, topic: Optional[str] = None) -> List[Tuple[str, float]]:
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        with self._lock:
+            n = len(self.ids)
+            if not n or (topic is not None and topic not in self._topic_codes):
+                return []
+            allowed = ~self._excluded[:n]
+            if topic is not None:
+                allowed &= self._topics[:n] == self._topic_codes[topic]
+            if self._graph is not None:
+                hits = self._graph_search(query, top_k, allowed)
+                if len(hits) < min(top_k, int(allowed.sum())):
+                    hits = self._exact(query, top_k, allowed)
+            else:
+                hits = self._exact(query, top_k, allowed)
+            hits.sort(key=lambda x: x[1], reverse=True)
+            return [(self.ids[pos], score) for pos, score in hits]
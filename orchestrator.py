@@ -23,16 +23,21 @@ class AgentTrace:
 class Orchestrator:
     def __init__(self):
         self.rag = RAGPipeline()
-        self.memory = MemoryStore()
+        self.memory = MemoryStore(chunk_resolver=self.rag.resolve_chunk_refs)
         self.parser = ParserAgent()
         self.router = IntentRouterAgent()
         self.solver = SolverAgent(rag_pipeline=self.rag)
         self.verifier = VerifierAgent()
         self.explainer = ExplainerAgent()
+        self._parser_corrections = None
 
+    # The parser compiles its corrections, so only hand it new ones when the
+    # memory's patterns for this input type actually changed.
     def _refresh_parser_corrections(self, input_type: str):
-        patterns = self.memory.get_correction_patterns(input_type)
-        self.parser.correction_patterns = patterns
+        key = (input_type, self.memory.correction_version(input_type))
+        if key != self._parser_corrections:
+            self.parser.correction_patterns = self.memory.get_correction_patterns(input_type)
+            self._parser_corrections = key
 
     def run(
         self,
@@ -86,8 +91,17 @@ class Orchestrator:
         result["route_info"] = route_info
 
         progress("📚 Retrieving knowledge...", 35)
-        context, chunks = self.rag.get_context_string(parsed.get("problem_text", raw_input))
-        trace.add("RAGPipeline", "✅ done", f"Retrieved {len(chunks)} relevant chunks", {"num_chunks": len(chunks)})
+        context, chunks, context_stats = self.rag.build_context(
+            parsed.get("problem_text", raw_input), topic=parsed.get("topic")
+        )
+        # The same context is sent to both the solver and the verifier.
+        context_stats["prompt_tokens_saved"] = context_stats["tokens_saved"] * 2
+        trace.add(
+            "RAGPipeline",
+            "✅ done",
+            f"Retrieved {len(chunks)} relevant chunks (~{context_stats['prompt_tokens_saved']} prompt tokens saved)",
+            {"num_chunks": len(chunks), **context_stats},
+        )
         result["retrieved_chunks"] = chunks
         result["context"] = context
 
@@ -130,7 +144,7 @@ class Orchestrator:
             input_type=input_type,
             raw_input=raw_input,
             parsed_question=parsed,
-            retrieved_context=chunks,
+            retrieved_context=self.rag.chunk_refs(chunks, context_stats["index_version"]),
             final_answer=solution.get("answer", ""),
             explanation=explanation,
             verifier_outcome=verification,
@@ -139,4 +153,25 @@ class Orchestrator:
 
         result["trace"] = trace.to_list()
         progress("✅ Complete!", 100)
-        return result
\ No newline at end of file
+        return result
+
+    # Solves several problems in order, e.g. the output of
+    # extract_problems_from_image. Items are raw strings or dicts with "text".
+    # Progress is reported across the whole batch.
+    def run_batch(
+        self,
+        problems: List,
+        input_type: str = "image",
+        progress_callback: Optional[Callable[[str, int], None]] = None,
+    ) -> List[Dict]:
+        results = []
+        total = len(problems)
+        for i, problem in enumerate(problems):
+            raw_input = problem["text"] if isinstance(problem, dict) else problem
+
+            def progress(msg: str, pct: int = 0, i=i):
+                if progress_callback:
+                    progress_callback(f"[{i + 1}/{total}] {msg}", int((i * 100 + pct) / total))
+
+            results.append(self.run(raw_input=raw_input, input_type=input_type, progress_callback=progress))
+        return results
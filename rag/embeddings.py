@@ -0,0 +1,167 @@
+import argparse
+import importlib.util
+import json
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from config import (
+    EMBEDDING_MODEL,
+    EMBEDDING_BACKEND,
+    EMBEDDING_THREADS,
+    EMBEDDING_BATCH_SIZE,
+    ONNX_MODEL_DIR,
+)
+
+ST_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+ORT_AVAILABLE = importlib.util.find_spec("onnxruntime") is not None
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model_int8.onnx"
+
+
+class TorchEmbedder:
+    name = "torch"
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, threads: int = EMBEDDING_THREADS):
+        if not ST_AVAILABLE:
+            raise ImportError("Run: pip install sentence-transformers")
+        if threads > 0:
+            import torch
+            torch.set_num_threads(threads)
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return self.model.encode(
+            texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False
+        ).astype(np.float32)
+
+
+class OnnxEmbedder:
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, quantized: bool = False, threads: int = EMBEDDING_THREADS):
+        if not ORT_AVAILABLE:
+            raise ImportError("Run: pip install onnxruntime tokenizers")
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        model_path = model_dir / (ONNX_INT8_FILE if quantized else ONNX_FILE)
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"{model_path} not found. Run: python -m rag.embeddings export"
+            )
+        meta = json.loads((model_dir / "export.json").read_text(encoding="utf-8"))
+        if meta.get("model") != EMBEDDING_MODEL:
+            raise ValueError(
+                f"ONNX model in {model_dir} was exported from {meta.get('model')}, "
+                f"expected {EMBEDDING_MODEL}. Re-run: python -m rag.embeddings export"
+            )
+        self.name = "onnx-int8" if quantized else "onnx"
+        self.dim = int(meta["dim"])
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=int(meta["max_seq_length"]))
+        self.tokenizer.enable_padding(pad_id=int(meta["pad_id"]), pad_token=meta["pad_token"])
+
+    def encode(self, texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encoded = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.zeros_like(input_ids)
+            hidden = self.session.run(None, feeds)[0]
+            # Same head as the sentence-transformers model: mean pooling + L2 norm.
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            batches.append(pooled.astype(np.float32))
+        return np.vstack(batches)
+
+
+def create_embedder(backend: str = EMBEDDING_BACKEND, threads: int = EMBEDDING_THREADS):
+    if backend == "torch":
+        return TorchEmbedder(threads=threads)
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEmbedder(quantized=backend == "onnx-int8", threads=threads)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}'. Use one of: {', '.join(BACKENDS)}.")
+
+
+def export_onnx(model_dir: str = ONNX_MODEL_DIR, model_name: str = EMBEDDING_MODEL, quantize: bool = True) -> Path:
+    if not ST_AVAILABLE or not ORT_AVAILABLE:
+        raise ImportError("Export needs: pip install sentence-transformers onnx onnxruntime")
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+
+    class _HiddenStates(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(
+                input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+            )[0]
+
+    out = Path(model_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    sample = tokenizer(["export sample", "a longer export sample sentence"], padding=True, return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    with torch.no_grad():
+        torch.onnx.export(
+            _HiddenStates(transformer),
+            tuple(sample[name] for name in input_names),
+            str(out / ONNX_FILE),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]},
+            opset_version=14,
+        )
+    tokenizer.backend_tokenizer.save(str(out / "tokenizer.json"))
+    meta = {
+        "model": model_name,
+        "dim": st_model.get_sentence_embedding_dimension(),
+        "max_seq_length": st_model.max_seq_length,
+        "pad_id": tokenizer.pad_token_id,
+        "pad_token": tokenizer.pad_token,
+    }
+    (out / "export.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(str(out / ONNX_FILE), str(out / ONNX_INT8_FILE), weight_type=QuantType.QInt8)
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding backend utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="export the embedding model to ONNX (+ int8 variant)")
+    export.add_argument("--out", default=ONNX_MODEL_DIR)
+    export.add_argument("--no-quantize", action="store_true")
+    args = parser.parse_args()
+    path = export_onnx(args.out, quantize=not args.no_quantize)
+    print(f"Exported {EMBEDDING_MODEL} to {path}")
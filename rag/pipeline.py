@@ -1,149 +1,712 @@
+import hashlib
+import importlib.util
+import json
 import os
 import pickle
-from typing import List, Tuple
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from pathlib import Path
 
 import numpy as np
 
-try:
-    from sentence_transformers import SentenceTransformer
-    ST_AVAILABLE = True
-except ImportError:
-    ST_AVAILABLE = False
+FAISS_AVAILABLE = importlib.util.find_spec("faiss") is not None
 
-try:
-    import faiss
-    FAISS_AVAILABLE = True
-except ImportError:
-    FAISS_AVAILABLE = False
+from config import (
+    KNOWLEDGE_BASE_PATH,
+    VECTOR_STORE_PATH,
+    VECTOR_STORE_KEEP_VERSIONS,
+    TOP_K_RETRIEVAL,
+    EMBEDDING_MODEL,
+    EMBEDDING_BACKEND,
+    EMBEDDING_BATCH_SIZE,
+    RAG_INDEX_TYPE,
+    RAG_HNSW_M,
+    RAG_HNSW_EF_SEARCH,
+    RAG_TOPIC_MIN_SCORE,
+    RAG_MMR_LAMBDA,
+    RAG_MMR_FETCH_FACTOR,
+    RAG_CONTEXT_MAX_CHARS,
+    RAG_RERANK_ENABLED,
+    RAG_RERANK_FETCH_K,
+)
+from rag.embeddings import create_embedder
+from rag.rerank import get_reranker
 
-from config import KNOWLEDGE_BASE_PATH, VECTOR_STORE_PATH, TOP_K_RETRIEVAL, EMBEDDING_MODEL
+# Parser topics that have a matching <topic>.txt in the knowledge base. Chunks
+# from SHARED_SOURCES cover every topic and are included in each partition.
+PARTITION_TOPICS = ("algebra", "probability", "calculus", "linear_algebra")
+SHARED_SOURCES = ("solution_templates.txt",)
+CONTEXT_SEPARATOR = "\n\n---\n\n"
 
 _embed_model = None
+_embed_lock = threading.Lock()
 
 
-def get_embed_model():
+# The embedder is shared by retrieval, memory and the startup warm-up. With
+# wait=False a caller that finds another thread mid-load gets None instead of
+# blocking, so it can fall back to a path that needs no embeddings.
+def get_embed_model(wait: bool = True):
     global _embed_model
     if _embed_model is None:
-        if not ST_AVAILABLE:
-            raise ImportError("Run: pip install sentence-transformers")
-        _embed_model = SentenceTransformer(EMBEDDING_MODEL)
+        if not wait and _embed_lock.locked():
+            return None
+        with _embed_lock:
+            if _embed_model is None:
+                _embed_model = create_embedder()
     return _embed_model
 
 
-class RAGPipeline:
-    def __init__(self):
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English and ASCII math.
+    return (len(text) + 3) // 4
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name == "nt":
+        # os.kill would terminate the process there; assume it is running.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Exists but belongs to another user, or the platform cannot tell.
+        return True
+    return True
+
+
+def _faiss():
+    import faiss
+    return faiss
+
+
+def _new_index(dim: int):
+    if not FAISS_AVAILABLE or RAG_INDEX_TYPE == "numpy":
+        return None
+    if RAG_INDEX_TYPE == "hnsw":
+        index = _faiss().IndexHNSWFlat(dim, RAG_HNSW_M)
+        index.hnsw.efSearch = RAG_HNSW_EF_SEARCH
+        return index
+    if RAG_INDEX_TYPE == "flat":
+        return _faiss().IndexFlatL2(dim)
+    raise ValueError(f"Unknown RAG_INDEX_TYPE '{RAG_INDEX_TYPE}'. Use 'flat', 'hnsw' or 'numpy'.")
+
+
+class IndexSnapshot:
+    def __init__(self, version: str = "", path: Optional[Path] = None):
+        self.version = version
+        self.path = path
         self.chunks: List[dict] = []
-        self.embeddings: np.ndarray = None
+        self.embeddings: Optional[np.ndarray] = None
         self.index = None
+        self.partitions: Dict[str, dict] = {}
+
+
+class RAGPipeline:
+    def __init__(self):
         self.store_path = Path(VECTOR_STORE_PATH)
-        self.store_path.mkdir(parents=True, exist_ok=True)
+        self.versions_path = self.store_path / "versions"
+        self.versions_path.mkdir(parents=True, exist_ok=True)
+        self._snapshot = IndexSnapshot()
+        self._pointer_mtime: Optional[int] = None
+        self._rebuild_lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._rebuild_thread: Optional[threading.Thread] = None
+        self.rebuild_status = {"state": "idle", "message": "", "pct": 0, "version": "", "error": ""}
         self._load_or_build()
 
-    def _load_knowledge_base(self) -> List[dict]:
-        docs = []
+    # Readers take one reference to the current snapshot and use only that,
+    # so a rebuild swapping in a new version never exposes a half-built index.
+    @property
+    def version(self) -> str:
+        return self._snapshot.version
+
+    @property
+    def chunks(self) -> List[dict]:
+        return self._snapshot.chunks
+
+    @property
+    def embeddings(self) -> Optional[np.ndarray]:
+        return self._snapshot.embeddings
+
+    @property
+    def index(self):
+        return self._snapshot.index
+
+    @property
+    def partitions(self) -> Dict[str, dict]:
+        return self._snapshot.partitions
+
+    def _knowledge_base_files(self) -> List[Path]:
         kb_path = Path(KNOWLEDGE_BASE_PATH)
         if not kb_path.exists():
-            return docs
-        for file_path in sorted(kb_path.glob("*.txt")):
+            return []
+        return sorted(kb_path.glob("*.txt"))
+
+    def _iter_knowledge_base(self, files: List[Path]) -> Iterator[Tuple[dict, int]]:
+        read = 0
+        for file_path in files:
             with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
-            chunks = self._chunk_text(content, source=file_path.name)
-            docs.extend(chunks)
-        return docs
+                for chunk, consumed in self._chunk_lines(f, source=file_path.name):
+                    yield chunk, read + consumed
+            read += file_path.stat().st_size
 
-    def _chunk_text(self, text: str, source: str, chunk_size: int = 500, overlap_lines: int = 3) -> List[dict]:
-        chunks = []
-        lines = text.split("\n")
+    def _chunk_lines(
+        self, lines: Iterable[str], source: str, chunk_size: int = 500, overlap_lines: int = 3
+    ) -> Iterator[Tuple[dict, int]]:
         current: List[str] = []
         current_len = 0
+        consumed = 0
         for line in lines:
+            consumed += len(line)
+            line = line.rstrip("\n")
             if current_len + len(line) > chunk_size and current:
                 chunk_text = "\n".join(current).strip()
                 if chunk_text:
-                    chunks.append({"text": chunk_text, "source": source})
-                current = current[-overlap_lines:] + [line]
-                current_len = sum(len(l) for l in current)
+                    yield {"text": chunk_text, "source": source}, consumed
+                current = current[-overlap_lines:]
+                current_len = sum(len(l) for l in current) + len(line)
+                current.append(line)
             else:
                 current.append(line)
                 current_len += len(line)
         if current:
             chunk_text = "\n".join(current).strip()
             if chunk_text:
-                chunks.append({"text": chunk_text, "source": source})
-        return chunks
+                yield {"text": chunk_text, "source": source}, consumed
+
+    def _chunk_text(self, text: str, source: str, chunk_size: int = 500, overlap_lines: int = 3) -> List[dict]:
+        return [c for c, _ in self._chunk_lines(text.split("\n"), source, chunk_size, overlap_lines)]
 
     def _embed(self, texts: List[str]) -> np.ndarray:
-        model = get_embed_model()
-        return model.encode(texts, convert_to_numpy=True, show_progress_bar=False).astype(np.float32)
+        return get_embed_model().encode(texts)
+
+    def _manifest(self, version: str, count: int, dim: int) -> dict:
+        return {
+            "version": version,
+            "created": time.time(),
+            "chunks": count,
+            "dim": dim,
+            "embedding_model": EMBEDDING_MODEL,
+            "embedding_backend": EMBEDDING_BACKEND,
+            "index_type": RAG_INDEX_TYPE,
+        }
+
+    def _build_version(self, progress_callback: Optional[Callable[[str, int], None]] = None) -> IndexSnapshot:
+        def progress(msg: str, pct: int):
+            if progress_callback:
+                progress_callback(msg, pct)
+
+        version = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f") + f"-{uuid.uuid4().hex[:6]}"
+        # Build under a dot-prefixed name and rename when complete, so a
+        # crashed build never looks like a loadable version. The pid lets
+        # _sweep_partials tell a killed build from one still running elsewhere.
+        build_path = self.versions_path / f".{version}.{os.getpid()}.partial"
+        build_path.mkdir(parents=True)
+        try:
+            files = self._knowledge_base_files()
+            total_bytes = sum(f.stat().st_size for f in files) or 1
+            raw_path = build_path / "embeddings.f32"
+            chunks: List[dict] = []
+            index = None
+            dim = 0
+
+            def flush(batch: List[dict]):
+                nonlocal index, dim
+                vectors = self._embed([c["text"] for c in batch])
+                if not dim:
+                    dim = vectors.shape[1]
+                    index = _new_index(dim)
+                raw.write(vectors.tobytes())
+                if index is not None:
+                    index.add(vectors)
+                chunks.extend(batch)
+
+            progress("Reading knowledge base...", 0)
+            with open(raw_path, "wb") as raw:
+                batch: List[dict] = []
+                for chunk, done in self._iter_knowledge_base(files):
+                    batch.append(chunk)
+                    if len(batch) >= EMBEDDING_BATCH_SIZE:
+                        flush(batch)
+                        batch = []
+                        progress(f"Embedded {len(chunks)} chunks", min(99, done * 100 // total_bytes))
+                if batch:
+                    flush(batch)
+
+            if chunks:
+                self._write_embeddings(raw_path, build_path / "embeddings.npy", len(chunks), dim)
+            raw_path.unlink()
+            with open(build_path / "chunks.pkl", "wb") as f:
+                pickle.dump(chunks, f)
+            if index is not None:
+                _faiss().write_index(index, str(build_path / "index.faiss"))
+            with open(build_path / "manifest.json", "w", encoding="utf-8") as f:
+                json.dump(self._manifest(version, len(chunks), dim), f, indent=2)
+            path = self.versions_path / version
+            os.replace(build_path, path)
+        except BaseException:
+            shutil.rmtree(build_path, ignore_errors=True)
+            raise
+
+        snapshot = self._load_snapshot(version, path)
+        progress(f"Indexed {len(chunks)} chunks" if chunks else "Knowledge base is empty", 100)
+        return snapshot
+
+    def _write_embeddings(self, raw_path: Path, npy_path: Path, count: int, dim: int):
+        # Copy the raw float32 stream into a .npy block by block so the full
+        # matrix is never materialised in memory.
+        raw = np.memmap(str(raw_path), dtype=np.float32, mode="r", shape=(count, dim))
+        out = np.lib.format.open_memmap(str(npy_path), mode="w+", dtype=np.float32, shape=(count, dim))
+        for start in range(0, count, 4096):
+            out[start:start + 4096] = raw[start:start + 4096]
+        out.flush()
+        del raw, out
+
+    def _load_snapshot(self, version: str, path: Path) -> IndexSnapshot:
+        snapshot = IndexSnapshot(version, path)
+        with open(path / "chunks.pkl", "rb") as f:
+            snapshot.chunks = pickle.load(f)
+        embeddings_path = path / "embeddings.npy"
+        if embeddings_path.exists():
+            snapshot.embeddings = np.load(str(embeddings_path), mmap_mode="r")
+        index_path = path / "index.faiss"
+        if index_path.exists() and FAISS_AVAILABLE and RAG_INDEX_TYPE != "numpy":
+            snapshot.index = _faiss().read_index(str(index_path))
+            if RAG_INDEX_TYPE == "hnsw":
+                snapshot.index.hnsw.efSearch = RAG_HNSW_EF_SEARCH
+        self._build_partitions(snapshot)
+        return snapshot
+
+    def _read_pointer(self) -> str:
+        try:
+            return (self.store_path / "CURRENT").read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            return ""
+
+    def _manifest_matches(self, path: Path) -> bool:
+        try:
+            with open(path / "manifest.json", "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return (
+            manifest.get("embedding_model") == EMBEDDING_MODEL
+            and manifest.get("embedding_backend") == EMBEDDING_BACKEND
+            and manifest.get("index_type", "flat") == RAG_INDEX_TYPE
+        )
+
+    def _load_current(self) -> Optional[IndexSnapshot]:
+        version = self._read_pointer()
+        if version:
+            path = self.versions_path / version
+            if (path / "chunks.pkl").exists() and self._manifest_matches(path):
+                return self._load_snapshot(version, path)
+            return None
+        # Stores written before versioning kept their files at the top level.
+        if (self.store_path / "chunks.pkl").exists() and (self.store_path / "embeddings.npy").exists():
+            return self._load_snapshot("legacy", self.store_path)
+        return None
+
+    def _publish(self, snapshot: IndexSnapshot):
+        pointer = self.store_path / "CURRENT"
+        tmp = self.store_path / f"CURRENT.{uuid.uuid4().hex[:8]}.tmp"
+        tmp.write_text(snapshot.version, encoding="utf-8")
+        os.replace(tmp, pointer)
+        self._snapshot = snapshot
+        self._pointer_mtime = pointer.stat().st_mtime_ns
+        self._collect_garbage(snapshot.version)
+
+    def _collect_garbage(self, current: str):
+        self._sweep_partials()
+        versions = sorted(
+            p.name for p in self.versions_path.iterdir() if p.is_dir() and not p.name.startswith(".")
+        )
+        keep = set(versions[max(0, len(versions) - max(1, VECTOR_STORE_KEEP_VERSIONS)):]) | {current}
+        for name in versions:
+            if name not in keep:
+                # Readers still holding an old snapshot keep working: mapped
+                # files stay valid until they are unmapped.
+                shutil.rmtree(self.versions_path / name, ignore_errors=True)
+        for name in ("chunks.pkl", "embeddings.npy", "index.faiss"):
+            legacy = self.store_path / name
+            if legacy.exists():
+                legacy.unlink()
+
+    # Removes build directories left by a build that was killed (SIGKILL, OOM)
+    # before it could clean up. Called under _rebuild_lock, so this process
+    # has no build in progress; builds of other live processes are kept.
+    def _sweep_partials(self):
+        for path in self.versions_path.glob(".*.partial"):
+            parts = path.name.split(".")
+            pid = int(parts[-2]) if len(parts) == 4 and parts[-2].isdigit() else None
+            if pid is not None and pid != os.getpid() and _pid_alive(pid):
+                continue
+            shutil.rmtree(path, ignore_errors=True)
 
-    def _build_index(self):
-        self.chunks = self._load_knowledge_base()
-        if not self.chunks:
-            self.index = None
+    def _maybe_reload(self):
+        # Picks up versions published by other processes sharing the store.
+        try:
+            mtime = (self.store_path / "CURRENT").stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._pointer_mtime:
             return
-        texts = [c["text"] for c in self.chunks]
-        self.embeddings = self._embed(texts)
-        if FAISS_AVAILABLE:
-            dim = self.embeddings.shape[1]
-            self.index = faiss.IndexFlatL2(dim)
-            self.index.add(self.embeddings)
-        self._save_index()
-
-    def _save_index(self):
-        with open(self.store_path / "chunks.pkl", "wb") as f:
-            pickle.dump(self.chunks, f)
-        if self.embeddings is not None:
-            np.save(str(self.store_path / "embeddings.npy"), self.embeddings)
-        if self.index is not None and FAISS_AVAILABLE:
-            faiss.write_index(self.index, str(self.store_path / "index.faiss"))
+        self._pointer_mtime = mtime
+        version = self._read_pointer()
+        if not version or version == self._snapshot.version:
+            return
+        try:
+            self._snapshot = self._load_snapshot(version, self.versions_path / version)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass
 
     def _load_or_build(self):
-        chunks_path = self.store_path / "chunks.pkl"
-        embeddings_path = self.store_path / "embeddings.npy"
-        index_path = self.store_path / "index.faiss"
-        if chunks_path.exists() and embeddings_path.exists():
-            with open(chunks_path, "rb") as f:
-                self.chunks = pickle.load(f)
-            self.embeddings = np.load(str(embeddings_path))
-            if index_path.exists() and FAISS_AVAILABLE:
-                self.index = faiss.read_index(str(index_path))
-        else:
-            self._build_index()
+        with self._rebuild_lock:
+            self._sweep_partials()
+        snapshot = self._load_current()
+        if snapshot is None:
+            self.rebuild_index()
+            return
+        self._snapshot = snapshot
+        try:
+            self._pointer_mtime = (self.store_path / "CURRENT").stat().st_mtime_ns
+        except FileNotFoundError:
+            pass
 
-    def rebuild_index(self):
-        self._build_index()
+    def rebuild_index(self, progress_callback: Optional[Callable[[str, int], None]] = None):
+        with self._rebuild_lock:
+            self._publish(self._build_version(progress_callback))
 
-    def retrieve(self, query: str, top_k: int = TOP_K_RETRIEVAL) -> List[dict]:
-        if not self.chunks:
-            return []
-        query_emb = self._embed([query])
-        if self.index is not None and FAISS_AVAILABLE:
-            distances, indices = self.index.search(query_emb, min(top_k, len(self.chunks)))
-            results = []
-            for dist, idx in zip(distances[0], indices[0]):
-                if 0 <= idx < len(self.chunks):
-                    chunk = self.chunks[idx].copy()
-                    chunk["score"] = float(1 / (1 + dist))
-                    results.append(chunk)
+    def rebuild_index_async(
+        self, progress_callback: Optional[Callable[[str, int], None]] = None
+    ) -> threading.Thread:
+        with self._thread_lock:
+            if self._rebuild_thread is not None and self._rebuild_thread.is_alive():
+                return self._rebuild_thread
+            status = {"state": "running", "message": "Starting rebuild...", "pct": 0, "version": "", "error": ""}
+            self.rebuild_status = status
+
+            def progress(msg: str, pct: int):
+                status["message"] = msg
+                status["pct"] = pct
+                if progress_callback:
+                    progress_callback(msg, pct)
+
+            def run():
+                try:
+                    self.rebuild_index(progress)
+                    status["version"] = self.version
+                    status["state"] = "done"
+                except Exception as e:
+                    status["error"] = str(e)
+                    status["state"] = "failed"
+
+            self._rebuild_thread = threading.Thread(target=run, name="rag-index-rebuild", daemon=True)
+            self._rebuild_thread.start()
+            return self._rebuild_thread
+
+    # A partition is only the sorted global positions of a topic's chunks (plus
+    # the shared ones). Searches filter the global index to those positions,
+    # so loading a snapshot copies no vectors and builds no extra index.
+    def _build_partitions(self, snapshot: IndexSnapshot):
+        snapshot.partitions = {}
+        if not snapshot.chunks or snapshot.embeddings is None:
+            return
+        by_topic: Dict[str, List[int]] = {}
+        shared = [i for i, c in enumerate(snapshot.chunks) if c["source"] in SHARED_SOURCES]
+        for i, chunk in enumerate(snapshot.chunks):
+            topic = Path(chunk["source"]).stem
+            if topic in PARTITION_TOPICS:
+                by_topic.setdefault(topic, []).append(i)
+        filtered = snapshot.index is not None and hasattr(_faiss(), "IDSelectorBatch")
+        for topic, ids in by_topic.items():
+            positions = np.array(sorted(ids + shared), dtype=np.int64)
+            selector = _faiss().IDSelectorBatch(positions) if filtered else None
+            snapshot.partitions[topic] = {"positions": positions, "selector": selector}
+
+    @staticmethod
+    def _search_params(partition: dict, k: int):
+        faiss = _faiss()
+        if RAG_INDEX_TYPE == "hnsw":
+            return faiss.SearchParametersHNSW(sel=partition["selector"], efSearch=max(RAG_HNSW_EF_SEARCH, k))
+        return faiss.SearchParameters(sel=partition["selector"])
+
+    def _search(
+        self, snapshot: IndexSnapshot, query_embs: np.ndarray, top_k: int, partition: Optional[dict] = None
+    ) -> List[List[dict]]:
+        positions = None if partition is None else partition["positions"]
+        size = len(snapshot.chunks) if positions is None else len(positions)
+        k = min(top_k, size)
+        results: List[List[dict]] = []
+
+        def make(idx: int, score: float) -> dict:
+            chunk = snapshot.chunks[int(idx)].copy()
+            chunk["chunk_id"] = int(idx)
+            chunk["score"] = score
+            return chunk
+
+        if snapshot.index is not None and FAISS_AVAILABLE and (partition is None or partition["selector"] is not None):
+            params = None if partition is None else self._search_params(partition, k)
+            distances, indices = snapshot.index.search(query_embs, k, params=params)
+            for row_dists, row_indices in zip(distances, indices):
+                results.append([
+                    make(idx, float(1 / (1 + dist)))
+                    for dist, idx in zip(row_dists, row_indices)
+                    if 0 <= idx < len(snapshot.chunks)
+                ])
             return results
+        if snapshot.embeddings is None:
+            return [[] for _ in range(len(query_embs))]
+        scores = np.dot(query_embs, snapshot.embeddings.T)
+        if positions is not None:
+            scores = scores[:, positions]
+        for row_scores in scores:
+            top = np.argsort(row_scores)[::-1][:k]
+            results.append([
+                make(idx if positions is None else positions[idx], float(row_scores[idx])) for idx in top
+            ])
+        return results
+
+    def retrieve(
+        self, query: str, top_k: int = TOP_K_RETRIEVAL, topic: Optional[str] = None, rerank: Optional[bool] = None
+    ) -> List[dict]:
+        return self.retrieve_many([query], top_k, topic, rerank)[0]
+
+    def retrieve_many(
+        self,
+        queries: List[str],
+        top_k: int = TOP_K_RETRIEVAL,
+        topic: Optional[str] = None,
+        rerank: Optional[bool] = None,
+    ) -> List[List[dict]]:
+        if not queries:
+            return []
+        self._maybe_reload()
+        snapshot = self._snapshot
+        if not snapshot.chunks:
+            return [[] for _ in queries]
+        rerank = RAG_RERANK_ENABLED if rerank is None else rerank
+        fetch_k = max(top_k, RAG_RERANK_FETCH_K) if rerank else top_k
+        results = self._retrieve(snapshot, self._embed(list(queries)), fetch_k, topic)
+        if rerank:
+            reranker = get_reranker()
+            results = [reranker.rerank(q, row, top_k) for q, row in zip(queries, results)]
+        return results
+
+    def _retrieve(
+        self, snapshot: IndexSnapshot, query_embs: np.ndarray, top_k: int, topic: Optional[str]
+    ) -> List[List[dict]]:
+        partition = snapshot.partitions.get(topic) if topic else None
+        if partition is None:
+            return self._search(snapshot, query_embs, top_k)
+        results = self._search(snapshot, query_embs, top_k, partition)
+        # Topic-local hits that score poorly usually mean the parser's topic
+        # was wrong or too narrow; retry those queries against everything.
+        weak = [i for i, row in enumerate(results) if not row or row[0]["score"] < RAG_TOPIC_MIN_SCORE]
+        if weak:
+            for i, row in zip(weak, self._search(snapshot, query_embs[weak], top_k)):
+                results[i] = row
+        return results
+
+    def _mmr(self, snapshot: IndexSnapshot, query_emb: np.ndarray, candidates: List[dict], top_k: int) -> List[dict]:
+        if len(candidates) <= 1 or RAG_MMR_LAMBDA >= 1 or snapshot.embeddings is None:
+            return candidates[:top_k]
+        vectors = np.asarray(snapshot.embeddings[[c["chunk_id"] for c in candidates]], dtype=np.float32)
+        vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        if all("rerank_score" in c for c in candidates):
+            # Cross-encoder logits, squashed onto the same 0..1 scale as cosine.
+            relevance = 1 / (1 + np.exp(-np.array([c["rerank_score"] for c in candidates], dtype=np.float32)))
         else:
-            if self.embeddings is None:
-                return []
-            scores = np.dot(self.embeddings, query_emb.T).flatten()
-            top_indices = np.argsort(scores)[::-1][:top_k]
-            results = []
-            for idx in top_indices:
-                chunk = self.chunks[idx].copy()
-                chunk["score"] = float(scores[idx])
-                results.append(chunk)
-            return results
+            query = query_emb / max(float(np.linalg.norm(query_emb)), 1e-12)
+            relevance = vectors @ query
+        similarity = vectors @ vectors.T
+        selected: List[int] = []
+        remaining = list(range(len(candidates)))
+        while remaining and len(selected) < top_k:
+            if selected:
+                redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+            else:
+                redundancy = np.zeros(len(remaining), dtype=np.float32)
+            scores = RAG_MMR_LAMBDA * relevance[remaining] - (1 - RAG_MMR_LAMBDA) * redundancy
+            selected.append(remaining.pop(int(np.argmax(scores))))
+        return [candidates[i] for i in selected]
 
-    def get_context_string(self, query: str, top_k: int = TOP_K_RETRIEVAL) -> Tuple[str, List[dict]]:
-        chunks = self.retrieve(query, top_k)
-        if not chunks:
-            return "", []
-        context = "\n\n---\n\n".join(
+    @staticmethod
+    def _merge_adjacent(chunks: List[dict]) -> List[dict]:
+        # Consecutive chunk ids from the same file share overlap_lines lines;
+        # stitch them into one passage instead of repeating the overlap.
+        groups: List[List[dict]] = []
+        for chunk in sorted(chunks, key=lambda c: c["chunk_id"]):
+            last = groups[-1][-1] if groups else None
+            if last and last["source"] == chunk["source"] and chunk["chunk_id"] == last["chunk_id"] + 1:
+                groups[-1].append(chunk)
+            else:
+                groups.append([chunk])
+        merged = []
+        for group in groups:
+            if len(group) == 1:
+                merged.append(group[0])
+                continue
+            lines = group[0]["text"].split("\n")
+            for chunk in group[1:]:
+                following = chunk["text"].split("\n")
+                overlap = next(
+                    (k for k in range(min(len(lines), len(following)), 0, -1) if lines[-k:] == following[:k]),
+                    0,
+                )
+                lines.extend(following[overlap:])
+            combined = group[0].copy()
+            combined["text"] = "\n".join(lines)
+            combined["score"] = max(c["score"] for c in group)
+            combined["chunk_ids"] = [c["chunk_id"] for c in group]
+            merged.append(combined)
+        merged.sort(key=lambda c: c["score"], reverse=True)
+        return merged
+
+    @staticmethod
+    def _fit_budget(chunks: List[dict], max_chars: int) -> List[dict]:
+        if max_chars <= 0:
+            return chunks
+        fitted: List[dict] = []
+        used = 0
+        for chunk in chunks:
+            header = len(f"[Source: {chunk['source']}]\n") + (len(CONTEXT_SEPARATOR) if fitted else 0)
+            cost = header + len(chunk["text"])
+            if used + cost <= max_chars:
+                fitted.append(chunk)
+                used += cost
+            elif not fitted and max_chars > header:
+                truncated = chunk.copy()
+                truncated["text"] = chunk["text"][:max_chars - header]
+                fitted.append(truncated)
+                used = max_chars
+        return fitted
+
+    def build_context(
+        self,
+        query: str,
+        top_k: int = TOP_K_RETRIEVAL,
+        topic: Optional[str] = None,
+        max_chars: int = RAG_CONTEXT_MAX_CHARS,
+        rerank: Optional[bool] = None,
+    ) -> Tuple[str, List[dict], Dict]:
+        stats = {"candidates": 0, "baseline_tokens": 0, "context_tokens": 0, "tokens_saved": 0}
+        self._maybe_reload()
+        snapshot = self._snapshot
+        stats["index_version"] = snapshot.version
+        if not snapshot.chunks:
+            return "", [], stats
+        rerank = RAG_RERANK_ENABLED if rerank is None else rerank
+        pool_k = top_k * max(1, RAG_MMR_FETCH_FACTOR)
+        fetch_k = max(pool_k, RAG_RERANK_FETCH_K) if rerank else pool_k
+        query_emb = self._embed([query])
+        candidates = self._retrieve(snapshot, query_emb, fetch_k, topic)[0]
+        pool = get_reranker().rerank(query, candidates, pool_k) if rerank else candidates[:pool_k]
+        chunks = self._mmr(snapshot, query_emb[0], pool, top_k)
+        chunks = self._fit_budget(self._merge_adjacent(chunks), max_chars)
+        context = self._format_context(chunks)
+        stats["candidates"] = len(candidates)
+        stats["baseline_tokens"] = estimate_tokens(self._format_context(candidates[:top_k]))
+        stats["context_tokens"] = estimate_tokens(context)
+        stats["tokens_saved"] = max(0, stats["baseline_tokens"] - stats["context_tokens"])
+        return context, chunks, stats
+
+    @staticmethod
+    def _digest(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+    # Compact references to build_context chunks: which chunk ids of which index
+    # version, how much text survived the budget, and a digest to check the
+    # text resolves back unchanged. The source comes back from the chunk ids;
+    # scores are query-dependent and are not kept, refs are in rank order.
+    def chunk_refs(self, chunks: List[dict], version: str) -> Dict:
+        refs = []
+        for chunk in chunks:
+            refs.append({
+                "chunk_ids": chunk.get("chunk_ids") or [chunk["chunk_id"]],
+                "chars": len(chunk["text"]),
+                "digest": self._digest(chunk["text"]),
+            })
+        return {"index_version": version, "chunks": refs}
+
+    def _chunks_for_version(self, version: str) -> Optional[List[dict]]:
+        snapshot = self._snapshot
+        if version == snapshot.version:
+            return snapshot.chunks
+        path = self.versions_path / version / "chunks.pkl"
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def _resolve_ref(self, chunks: Optional[List[dict]], ref: dict) -> Optional[dict]:
+        ids = ref["chunk_ids"]
+        if chunks is None or any(i >= len(chunks) for i in ids):
+            return None
+        group = [dict(chunks[i], chunk_id=i, score=0.0) for i in ids]
+        merged = self._merge_adjacent(group)[0]
+        text = merged["text"][:ref["chars"]]
+        if self._digest(text) != ref["digest"]:
+            return None
+        return {"source": merged["source"], "text": text}
+
+    def resolve_chunk_refs(self, refs: Dict) -> List[dict]:
+        # The recorded version may have been garbage-collected; a rebuild from an
+        # unchanged knowledge base has the same chunk ids, so try the current
+        # version next and mark the chunk missing only if neither matches.
+        # Records written before refs were trimmed also carry source and score.
+        recorded = self._chunks_for_version(refs.get("index_version", ""))
+        current = None
+        resolved = []
+        for rank, ref in enumerate(refs.get("chunks", [])):
+            found = self._resolve_ref(recorded, ref)
+            if found is None:
+                current = current if current is not None else self._snapshot.chunks
+                found = self._resolve_ref(current, ref)
+            chunk = {"source": ref.get("source", ""), "rank": rank, "chunk_ids": ref["chunk_ids"], "text": ""}
+            if "score" in ref:
+                chunk["score"] = ref["score"]
+            if found is None:
+                chunk["missing"] = True
+            else:
+                chunk.update(found)
+            resolved.append(chunk)
+        return resolved
+
+    @staticmethod
+    def merge_results(results: List[List[dict]], dedupe: bool = True) -> List[dict]:
+        if not dedupe:
+            return [chunk for row in results for chunk in row]
+        best: Dict[int, dict] = {}
+        for row in results:
+            for chunk in row:
+                seen = best.get(chunk["chunk_id"])
+                if seen is None or chunk["score"] > seen["score"]:
+                    best[chunk["chunk_id"]] = chunk
+        return sorted(best.values(), key=lambda c: c["score"], reverse=True)
+
+    @staticmethod
+    def _format_context(chunks: List[dict]) -> str:
+        return CONTEXT_SEPARATOR.join(
             f"[Source: {c['source']}]\n{c['text']}" for c in chunks
         )
-        return context, chunks
\ No newline at end of file
+
+    def get_context_string(
+        self, query: str, top_k: int = TOP_K_RETRIEVAL, topic: Optional[str] = None
+    ) -> Tuple[str, List[dict]]:
+        context, chunks, _ = self.build_context(query, top_k, topic)
+        return context, chunks
+
+    def get_context_string_many(
+        self, queries: List[str], top_k: int = TOP_K_RETRIEVAL, topic: Optional[str] = None, dedupe: bool = True
+    ) -> Tuple[str, List[dict]]:
+        chunks = self.merge_results(self.retrieve_many(queries, top_k, topic), dedupe=dedupe)
+        if not chunks:
+            return "", []
+        return self._format_context(chunks), chunks
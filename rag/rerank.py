@@ -0,0 +1,132 @@
+import importlib.util
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import List, Optional
+
+import numpy as np
+
+from config import RAG_RERANK_MODEL, RAG_RERANK_BUDGET_MS, RAG_RERANK_CACHE_SIZE
+
+ST_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+
+
+class CrossEncoderReranker:
+    def __init__(
+        self,
+        model_name: str = RAG_RERANK_MODEL,
+        budget_ms: float = RAG_RERANK_BUDGET_MS,
+        cache_size: int = RAG_RERANK_CACHE_SIZE,
+        batch_size: int = 8,
+    ):
+        self.model_name = model_name
+        self.budget_ms = budget_ms
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self._model = None
+        self._load_lock = threading.Lock()
+        # Guards only the _loader check, so a query never waits on a load.
+        self._loader_lock = threading.Lock()
+        self._loader: Optional[threading.Thread] = None
+        self._cache: "OrderedDict[tuple, float]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # One scoring worker: the caller waits on it for at most the budget,
+        # and a job that runs late still finishes and fills the cache.
+        self._scorer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        self.stats = {"reranked": 0, "fallbacks": 0, "cache_hits": 0}
+
+    @property
+    def ready(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        with self._load_lock:
+            if self._model is None:
+                if not ST_AVAILABLE:
+                    raise ImportError("Run: pip install sentence-transformers")
+                from sentence_transformers import CrossEncoder
+                self._model = CrossEncoder(self.model_name, device="cpu", max_length=256)
+        return self._model
+
+    # A load already running (e.g. the startup warm-up calling load()) holds
+    # _load_lock; no second thread is needed then.
+    def _load_in_background(self):
+        if self._load_lock.locked():
+            return
+        with self._loader_lock:
+            if self._loader is None and ST_AVAILABLE:
+                self._loader = threading.Thread(target=self.load, name="rerank-model-load", daemon=True)
+                self._loader.start()
+
+    def _cached(self, key: tuple) -> Optional[float]:
+        with self._cache_lock:
+            score = self._cache.get(key)
+            if score is not None:
+                self._cache.move_to_end(key)
+            return score
+
+    def _remember(self, key: tuple, score: float):
+        with self._cache_lock:
+            self._cache[key] = score
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _score(self, pairs: List[tuple], keys: List[tuple]) -> List[float]:
+        scores: List[float] = []
+        for start in range(0, len(pairs), self.batch_size):
+            predicted = self._model.predict(pairs[start:start + self.batch_size], show_progress_bar=False)
+            for key, score in zip(keys[start:start + self.batch_size], np.atleast_1d(predicted)):
+                scores.append(float(score))
+                self._remember(key, scores[-1])
+        return scores
+
+    def rerank(self, query: str, candidates: List[dict], top_k: int) -> List[dict]:
+        # Never blocks on model loading: until the cross-encoder is ready, or
+        # whenever scoring does not finish within the budget, keep first-stage
+        # order. The budget is a hard limit on the wait; scores that arrive
+        # after it only go to the cache.
+        if len(candidates) <= 1:
+            return candidates[:top_k]
+        if not self.ready:
+            self._load_in_background()
+            self.stats["fallbacks"] += 1
+            return candidates[:top_k]
+
+        deadline = time.perf_counter() + self.budget_ms / 1000
+        keys = [(query, c["source"], c["text"]) for c in candidates]
+        scores: List[Optional[float]] = [self._cached(k) for k in keys]
+        self.stats["cache_hits"] += sum(s is not None for s in scores)
+        missing = [i for i, s in enumerate(scores) if s is None]
+        if missing:
+            future = self._scorer.submit(
+                self._score,
+                [(query, candidates[i]["text"]) for i in missing],
+                [keys[i] for i in missing],
+            )
+            try:
+                predicted = future.result(timeout=max(0.0, deadline - time.perf_counter()))
+            except FutureTimeout:
+                self.stats["fallbacks"] += 1
+                return candidates[:top_k]
+            for i, score in zip(missing, predicted):
+                scores[i] = score
+
+        self.stats["reranked"] += 1
+        reranked = []
+        for i in sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)[:top_k]:
+            chunk = candidates[i].copy()
+            chunk["rerank_score"] = scores[i]
+            reranked.append(chunk)
+        return reranked
+
+
+_reranker: Optional[CrossEncoderReranker] = None
+
+
+def get_reranker() -> CrossEncoderReranker:
+    global _reranker
+    if _reranker is None:
+        _reranker = CrossEncoderReranker()
+    return _reranker
@@ -1,74 +1,267 @@
-from typing import Tuple
+import importlib.util
+import os
+import queue
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, List, Optional, Tuple
 
-try:
+import numpy as np
+
+WHISPER_AVAILABLE = importlib.util.find_spec("whisper") is not None
+
+from config import (
+    ASR_CHUNK_SECONDS,
+    ASR_CONFIDENCE_THRESHOLD,
+    ASR_MIN_SILENCE_MS,
+    ASR_WORKERS,
+    WHISPER_MODEL_SIZE,
+)
+from utils.cache import content_key, get_cache
+from utils.math_speech import normalize_math_speech
+
+# Bump when a change to transcription would change results for the same audio.
+ASR_CACHE_VERSION = 3
+
+# Whisper's input format: mono float32 at 16 kHz.
+SAMPLE_RATE = 16000
+
+# A file path, encoded audio bytes (or a binary file object such as BytesIO or
+# a Streamlit upload), or samples already decoded to SAMPLE_RATE mono.
+AudioSource = Any
+
+# Voice activity detection works on frames of this length.
+VAD_FRAME_MS = 30
+# Speech shorter than this is a click or a breath, not a word.
+VAD_MIN_SPEECH_MS = 120
+# Kept around each speech region so word onsets and tails are not clipped.
+VAD_PAD_MS = 200
+
+# Idle Whisper models. Up to ASR_WORKERS are loaded; a decode holds one for
+# its duration because Whisper installs per-call hooks on the model.
+_idle_models: "queue.Queue" = queue.Queue()
+_models_loaded = 0
+_models_lock = threading.Lock()
+_chunk_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _audio_bytes(source: AudioSource) -> bytes:
+    if isinstance(source, np.ndarray):
+        return np.ascontiguousarray(source, dtype=np.float32).tobytes()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return f.read()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    return source.getvalue() if hasattr(source, "getvalue") else source.read()
+
+
+def _ffmpeg(input_arg: str, data: bytes = None) -> subprocess.CompletedProcess:
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-i", input_arg,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "pipe:1",
+    ]
+    try:
+        return subprocess.run(cmd, input=data, capture_output=True)
+    except FileNotFoundError:
+        raise RuntimeError("ffmpeg not found. Install it to decode audio uploads.")
+
+
+# Decodes any format ffmpeg reads into Whisper's sample format, streaming the
+# bytes through a pipe. Containers whose index sits at the end of the file
+# (most .m4a/.mp4) cannot be read from a pipe; those go through a temporary
+# file that is always removed.
+def decode_audio(data: bytes) -> np.ndarray:
+    proc = _ffmpeg("pipe:0", data)
+    if proc.returncode != 0 or not proc.stdout:
+        fd, path = tempfile.mkstemp(suffix=".audio")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            proc = _ffmpeg(path)
+        finally:
+            os.unlink(path)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Could not decode audio: {proc.stderr.decode('utf-8', 'replace').strip()}")
+    return np.frombuffer(proc.stdout, np.int16).astype(np.float32) / 32768.0
+
+
+def _samples(source: AudioSource) -> np.ndarray:
+    if isinstance(source, np.ndarray):
+        return np.asarray(source, dtype=np.float32)
+    return decode_audio(_audio_bytes(source))
+
+
+def _frame_energy(samples: np.ndarray) -> np.ndarray:
+    frame = SAMPLE_RATE * VAD_FRAME_MS // 1000
+    count = len(samples) // frame
+    frames = samples[: count * frame].reshape(count, frame)
+    return 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+
+
+# Frames louder than the recording's noise floor by a margin, with gaps shorter
+# than ASR_MIN_SILENCE_MS bridged, as (start, end) frame ranges. The threshold
+# comes only from the recording's own levels, so a quiet but clean recording
+# is judged against its own floor; it is capped below the loud frames so a
+# recording with no pauses still counts as speech.
+def _speech_frames(energy: np.ndarray) -> List[Tuple[int, int]]:
+    if not len(energy):
+        return []
+    floor, loud = np.percentile(energy, 10), np.percentile(energy, 95)
+    threshold = min(floor + 10, loud - 25)
+    voiced = np.concatenate(([False], energy > threshold, [False]))
+    edges = np.flatnonzero(voiced[1:] != voiced[:-1])
+    runs = [[int(a), int(b)] for a, b in zip(edges[::2], edges[1::2])]
+
+    max_gap = ASR_MIN_SILENCE_MS // VAD_FRAME_MS
+    merged: List[List[int]] = []
+    for run in runs:
+        if merged and run[0] - merged[-1][1] < max_gap:
+            merged[-1][1] = run[1]
+        else:
+            merged.append(run)
+    min_len = max(1, VAD_MIN_SPEECH_MS // VAD_FRAME_MS)
+    return [(a, b) for a, b in merged if b - a >= min_len]
+
+
+# Splits the audio at pauses into chunks of speech no longer than max_seconds,
+# as (start, end) sample ranges. Leading and trailing silence, and the pauses
+# between chunks, are dropped. A region longer than max_seconds is cut at its quietest frame in the
+# second half of the window, so a word is rarely split.
+def speech_chunks(samples: np.ndarray, max_seconds: Optional[float] = None) -> List[Tuple[int, int]]:
+    frame = SAMPLE_RATE * VAD_FRAME_MS // 1000
+    max_frames = max(1, int((max_seconds or ASR_CHUNK_SECONDS) * 1000 // VAD_FRAME_MS))
+    pad = VAD_PAD_MS // VAD_FRAME_MS
+    energy = _frame_energy(samples)
+    total = len(energy)
+
+    regions: List[Tuple[int, int]] = []
+    for a, b in _speech_frames(energy):
+        a, b = max(0, a - pad), min(total, b + pad)
+        if regions and a <= regions[-1][1]:
+            a = regions.pop()[0]
+        regions.append((a, b))
+
+    chunks: List[Tuple[int, int]] = []
+    for a, b in regions:
+        while b - a > max_frames:
+            window = energy[a + max_frames // 2: a + max_frames]
+            cut = a + max_frames // 2 + int(np.argmin(window))
+            chunks.append((a, cut))
+            a = cut
+        if chunks and b - chunks[-1][0] <= max_frames:
+            chunks[-1] = (chunks[-1][0], b)
+        else:
+            chunks.append((a, b))
+    # The last frame absorbs the tail samples that did not fill a whole frame.
+    return [(a * frame, len(samples) if b == total else b * frame) for a, b in chunks]
+
+
+def _load_whisper_model():
+    if not WHISPER_AVAILABLE:
+        raise ImportError(
+            "openai-whisper not installed. "
+            "Run: pip install openai-whisper  (also needs ffmpeg)"
+        )
     import whisper
-    WHISPER_AVAILABLE = True
-except ImportError:
-    WHISPER_AVAILABLE = False
+    return whisper.load_model(WHISPER_MODEL_SIZE)
+
+
+@contextmanager
+def _whisper_model():
+    global _models_loaded
+    try:
+        model = _idle_models.get_nowait()
+    except queue.Empty:
+        model = None
+        with _models_lock:
+            if _models_loaded < max(1, ASR_WORKERS):
+                model = _load_whisper_model()
+                _models_loaded += 1
+        if model is None:
+            model = _idle_models.get()
+    try:
+        yield model
+    finally:
+        _idle_models.put(model)
+
+
+def whisper_ready() -> bool:
+    return _models_loaded > 0
+
+
+# Loads the first pool model ahead of the first transcription.
+def preload_whisper_model():
+    with _whisper_model():
+        pass
+
+
+def _get_chunk_pool() -> ThreadPoolExecutor:
+    global _chunk_pool
+    with _models_lock:
+        if _chunk_pool is None:
+            _chunk_pool = ThreadPoolExecutor(max_workers=max(1, ASR_WORKERS), thread_name_prefix="asr-chunk")
+    return _chunk_pool
 
-from config import ASR_CONFIDENCE_THRESHOLD
 
-_whisper_model = None
+# Text of one chunk and its segments as (seconds, avg_logprob). Chunks are
+# independent, so the previous chunk's text is not used as a prompt.
+def _transcribe_chunk(samples: np.ndarray) -> Tuple[str, List[Tuple[float, float]]]:
+    with _whisper_model() as model:
+        result = model.transcribe(samples, condition_on_previous_text=False)
+    segments = [
+        (max(0.0, s.get("end", 0.0) - s.get("start", 0.0)), s.get("avg_logprob", -1.0))
+        for s in result.get("segments", [])
+    ]
+    return result.get("text", "").strip(), segments
 
 
-def _get_whisper_model():
-    global _whisper_model
-    if _whisper_model is None:
-        if not WHISPER_AVAILABLE:
-            raise ImportError(
-                "openai-whisper not installed. "
-                "Run: pip install openai-whisper  (also needs ffmpeg)"
-            )
-        _whisper_model = whisper.load_model("base")
-    return _whisper_model
+# Duration-weighted mean log-probability over all segments, mapped to 0..1.
+def _confidence(segments: List[Tuple[float, float]], text: str) -> float:
+    total = sum(seconds for seconds, _ in segments)
+    if total <= 0:
+        return 0.6 if text else 0.0
+    avg_logprob = sum(seconds * logprob for seconds, logprob in segments) / total
+    return max(0.0, min(1.0, avg_logprob + 1.0))
 
 
-def transcribe_with_whisper_local(audio_path: str) -> Tuple[str, float]:
+# Transcribes speech chunk by chunk, so a decode never sees more than
+# ASR_CHUNK_SECONDS of audio. With ASR_WORKERS > 1 chunks decode in parallel
+# on separate model instances. Either way results arrive in order, and
+# progress_callback gets the transcript so far and the percentage done.
+def transcribe_with_whisper_local(
+    audio: AudioSource, progress_callback: Optional[Callable[[str, int], None]] = None
+) -> Tuple[str, float]:
     try:
-        model = _get_whisper_model()
-        result = model.transcribe(audio_path)
-        text = result.get("text", "").strip()
-        segments = result.get("segments", [])
-        if segments:
-            avg_logprob = sum(s.get("avg_logprob", -1.0) for s in segments) / len(segments)
-            conf = max(0.0, min(1.0, avg_logprob + 1.0))
+        samples = _samples(audio)
+        # No speech found is more likely a missed threshold than a silent
+        # clip, so Whisper gets the whole recording then.
+        pieces = [samples[a:b] for a, b in speech_chunks(samples) or [(0, len(samples))]]
+        if len(pieces) > 1 and ASR_WORKERS > 1:
+            results = _get_chunk_pool().map(_transcribe_chunk, pieces)
         else:
-            conf = 0.6 if text else 0.0
-        return text, conf
+            results = map(_transcribe_chunk, pieces)
+        texts: List[str] = []
+        segments: List[Tuple[float, float]] = []
+        for i, (chunk_text, chunk_segments) in enumerate(results):
+            if chunk_text:
+                texts.append(chunk_text)
+            segments.extend(chunk_segments)
+            if progress_callback:
+                progress_callback(" ".join(texts), int(100 * (i + 1) / len(pieces)))
+        text = " ".join(texts)
+        return text, _confidence(segments, text)
     except ImportError as e:
         return str(e), 0.0
     except Exception as e:
         return f"Whisper error: {e}", 0.0
 
 
-def normalize_math_speech(text: str) -> str:
-    replacements = {
-        "square root of": "sqrt(",
-        "squared": "^2",
-        "cubed": "^3",
-        "raised to the power of": "^",
-        "raised to": "^",
-        "divided by": "/",
-        "multiplied by": "*",
-        "times": "*",
-        "plus": "+",
-        "minus": "-",
-        "equals": "=",
-        "pi": "π",
-        "infinity": "∞",
-        "log base": "log_",
-        "natural log": "ln",
-        "sine of": "sin(",
-        "cosine of": "cos(",
-        "tangent of": "tan(",
-    }
-    result = text.lower()
-    for phrase, symbol in replacements.items():
-        result = result.replace(phrase, symbol)
-    return result
-
-
-def transcribe_audio(audio_path: str) -> Tuple[str, float, bool]:
+def transcribe_audio(
+    source: AudioSource, progress_callback: Optional[Callable[[str, int], None]] = None
+) -> Tuple[str, float, bool]:
     if not WHISPER_AVAILABLE:
         return (
             "Audio transcription not available. "
@@ -77,7 +270,21 @@ def transcribe_audio(audio_path: str) -> Tuple[str, float, bool]:
             0.0,
             True,
         )
-    text, conf = transcribe_with_whisper_local(audio_path)
+    data = _audio_bytes(source)
+    key = content_key(
+        data, "whisper", WHISPER_MODEL_SIZE, ASR_CHUNK_SECONDS, ASR_MIN_SILENCE_MS, ASR_CACHE_VERSION
+    )
+    cache = get_cache("asr")
+    cached = cache.get(key)
+    if cached is not None:
+        text, conf = cached
+    else:
+        audio = source if isinstance(source, np.ndarray) else data
+        text, conf = transcribe_with_whisper_local(audio, progress_callback)
+        # Zero confidence covers load and decode errors, which may be transient.
+        if conf > 0:
+            cache.put(key, [text, conf])
+    # The raw transcript is cached, so normalizer changes apply to cached audio.
     text = normalize_math_speech(text)
     needs_hitl = conf < ASR_CONFIDENCE_THRESHOLD
     return text, conf, needs_hitl
\ No newline at end of file
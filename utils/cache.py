@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from config import RESULT_CACHE_DIR, RESULT_CACHE_SIZE
+
+
+# Key for a result computed from `data`: the SHA-256 of the bytes, combined
+# with whatever else decides the result (engine, model, config version).
+def content_key(data: bytes, *parts: Any) -> str:
+    h = hashlib.sha256(hashlib.sha256(data).digest())
+    for part in parts:
+        h.update(b"\0" + repr(part).encode("utf-8"))
+    return h.hexdigest()
+
+
+# Bounded LRU of JSON-serializable results, persisted as one small file per
+# entry so it survives restarts and is shared by processes using the same
+# directory. Hits touch the file, so the least recently used entries are the
+# ones evicted, in memory and on disk alike. max_entries=0 disables caching.
+class ResultCache:
+    def __init__(self, root: Optional[Path], max_entries: int):
+        self.root = root
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+        if root is not None and max_entries > 0 and root.exists():
+            files = sorted(root.glob("*/*.json"), key=lambda p: p.stat().st_mtime)
+            for path in files:
+                self._entries[path.stem] = None
+            self._evict()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            key, _ = self._entries.popitem(last=False)
+            if self.root is not None:
+                try:
+                    self._path(key).unlink()
+                except OSError:
+                    pass
+
+    def get(self, key: str) -> Optional[Any]:
+        if self.max_entries <= 0:
+            return None
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None and self.root is not None:
+                # Known from disk but not loaded yet, or written by another process.
+                path = self._path(key)
+                try:
+                    value = json.loads(path.read_text(encoding="utf-8"))
+                    os.utime(path)
+                except (OSError, ValueError):
+                    value = None
+            if value is None:
+                self._entries.pop(key, None)
+                self.stats["misses"] += 1
+                return None
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def put(self, key: str, value: Any):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if self.root is not None:
+                path = self._path(key)
+                try:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+                    tmp.write_text(json.dumps(value), encoding="utf-8")
+                    os.replace(tmp, path)
+                except OSError:
+                    # Still cached in memory; disk persistence is best effort.
+                    pass
+            self._evict()
+
+
+_caches: Dict[str, ResultCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name: str) -> ResultCache:
+    with _caches_lock:
+        if name not in _caches:
+            root = Path(RESULT_CACHE_DIR) / name if RESULT_CACHE_DIR else None
+            _caches[name] = ResultCache(root, RESULT_CACHE_SIZE)
+        return _caches[name]
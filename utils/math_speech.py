@@ -0,0 +1,134 @@
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Spoken phrase -> symbol. Matched on whole words with any run of whitespace
+# between them, so "pi" never fires inside "pipeline".
+MATH_PHRASES: Dict[str, str] = {
+    "square root of": "sqrt(",
+    "squared": "^2",
+    "cubed": "^3",
+    "raised to the power of": "^",
+    "raised to": "^",
+    "to the power of": "^",
+    "divided by": "/",
+    "multiplied by": "*",
+    "times": "*",
+    "plus or minus": "±",
+    "plus": "+",
+    "minus": "-",
+    "equals": "=",
+    "is equal to": "=",
+    "not equal to": "≠",
+    "is not equal to": "≠",
+    "less than or equal to": "≤",
+    "greater than or equal to": "≥",
+    "is less than or equal to": "≤",
+    "is greater than or equal to": "≥",
+    "is less than": "<",
+    "is greater than": ">",
+    "pi": "π",
+    "infinity": "∞",
+    "log base": "log_",
+    "natural log": "ln",
+    "sine of": "sin(",
+    "cosine of": "cos(",
+    "tangent of": "tan(",
+    "integral of": "∫",
+    "open bracket": "(",
+    "close bracket": ")",
+}
+
+NUMBER_WORDS = {
+    "one": "1", "two": "2", "three": "3", "four": "4", "five": "5",
+    "six": "6", "seven": "7", "eight": "8", "nine": "9", "ten": "10",
+}
+
+_ORDINALS = {
+    "third": "3", "fourth": "4", "quarter": "4", "fifth": "5", "sixth": "6",
+    "seventh": "7", "eighth": "8", "ninth": "9", "tenth": "10",
+}
+DENOMINATORS = {"half": "2", "halves": "2", **_ORDINALS, **{w + "s": d for w, d in _ORDINALS.items()}}
+
+# A bound, subscript or fraction term: a number, a single letter, pi or
+# (minus) infinity.
+OPERAND = r"(?:minus\s+)?(?:\d+(?:\.\d+)?|[a-z]|pi|infinity)"
+
+# A rule is (pattern, rewrite). rewrite is called with the pattern's groups
+# and returns the replacement text.
+Rule = Tuple[str, Callable[..., str]]
+
+
+def _operand(text: str) -> str:
+    return "".join(MATH_PHRASES.get(word, word) for word in text.split())
+
+
+# Regex for any of the phrases, factored into a character trie so that at a
+# given position most branches fail on their first character, instead of
+# trying every phrase in turn. Optional tails are greedy, so the longest
+# phrase is tried first. Spaces inside a phrase match any whitespace.
+def _trie(phrases) -> str:
+    root: Dict[str, dict] = {}
+    for phrase in phrases:
+        node = root
+        for i, word in enumerate(phrase.split()):
+            for step in ([r"\s+"] if i else []) + [re.escape(c) for c in word]:
+                node = node.setdefault(step, {})
+        node[""] = {}
+
+    def emit(node: Dict[str, dict]) -> str:
+        branches = [step + emit(child) for step, child in sorted(node.items()) if step]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return f"(?:{body})?" if len(branches) == 1 else body + "?"
+        return body
+
+    return emit(root)
+
+
+# Structured phrases, tried before the plain phrases at each position.
+MATH_RULES: List[Rule] = [
+    (rf"integral\s+from\s+({OPERAND})\s+to\s+({OPERAND})\s+of",
+     lambda a, b: f"∫_{_operand(a)}^{_operand(b)}"),
+    (rf"log\s+base\s+({OPERAND})", lambda base: f"log_{_operand(base)}"),
+    (r"([a-z])\s+sub\s+(\d+|[a-z])", lambda x, n: f"{x}_{n}"),
+    (r"(\d+(?:\.\d+)?|[a-z])\s+over\s+(\d+(?:\.\d+)?|[a-z])", lambda a, b: f"{a}/{b}"),
+    (rf"({_trie(NUMBER_WORDS)}|\d+)\s+({_trie(DENOMINATORS)})",
+     lambda n, d: f"{NUMBER_WORDS.get(n, n)}/{DENOMINATORS[d]}"),
+]
+
+
+# Rewrites spoken math in a single left-to-right pass. Rules and phrases are
+# compiled into one alternation of whole-word patterns: rules first, then the
+# phrase trie, longest phrase first, so at any position the most specific
+# match wins. Rewritten text is never rescanned, so the result does not
+# depend on the order of the tables.
+class MathSpeechNormalizer:
+    def __init__(self, phrases: Optional[Dict[str, str]] = None, rules: Optional[List[Rule]] = None):
+        self.phrases = dict(MATH_PHRASES if phrases is None else phrases)
+        self.rules = list(MATH_RULES if rules is None else rules)
+        alternatives = [f"(?P<r{i}>{pattern})" for i, (pattern, _) in enumerate(self.rules)]
+        alternatives.append(_trie(self.phrases))
+        self._regex = re.compile(r"(?<!\w)(?:" + "|".join(a for a in alternatives if a) + r")(?!\w)")
+        # Rule name -> (its rewrite, span of its inner groups in the full regex).
+        self._rewrites = {}
+        for i, (pattern, rewrite) in enumerate(self.rules):
+            first = self._regex.groupindex[f"r{i}"]
+            self._rewrites[f"r{i}"] = (rewrite, first, first + re.compile(pattern).groups)
+
+    def _rewrite(self, m: re.Match) -> str:
+        if m.lastgroup is None:
+            return self.phrases[" ".join(m.group(0).split())]
+        rewrite, first, last = self._rewrites[m.lastgroup]
+        return rewrite(*m.groups()[first:last])
+
+    def __call__(self, text: str) -> str:
+        return self._regex.sub(self._rewrite, text.lower())
+
+
+_default = MathSpeechNormalizer()
+
+
+def normalize_math_speech(text: str) -> str:
+    return _default(text)
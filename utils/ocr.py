@@ -1,47 +1,237 @@
-from typing import Tuple
+import importlib.util
+import io
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
 
-try:
+import numpy as np
+
+PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None
+TESSERACT_AVAILABLE = importlib.util.find_spec("pytesseract") is not None
+EASYOCR_AVAILABLE = importlib.util.find_spec("easyocr") is not None
+
+from config import (
+    OCR_CONFIDENCE_THRESHOLD,
+    OCR_MODE,
+    OCR_PREPROCESS,
+    OCR_TARGET_DPI,
+    OCR_PAGE_WIDTH_IN,
+    OCR_WORKERS,
+)
+from utils.cache import content_key, get_cache
+
+_easyocr_reader = None
+_reader_lock = threading.Lock()
+_read_lock = threading.Lock()
+_engine_pool: Optional[ThreadPoolExecutor] = None
+_stats_lock = threading.Lock()
+_engine_stats: Dict[str, Dict] = {}
+_region_pool: Optional[ProcessPoolExecutor] = None
+_region_pool_lock = threading.Lock()
+
+PREPROCESS_STEPS = ("downscale", "grayscale", "threshold", "deskew", "crop")
+# Mean-C adaptive threshold: a pixel is ink when it is this much darker than
+# its neighbourhood, which spans about 1/10 inch at the target DPI.
+THRESHOLD_OFFSET = 10
+DESKEW_MAX_ANGLE = 10.0
+# Bump when a change to the OCR code would change results for the same config.
+OCR_CACHE_VERSION = 1
+
+# A file path, encoded image bytes (or a binary file object such as BytesIO
+# or a Streamlit upload), a decoded array, or a PIL image.
+ImageSource = Any
+
+
+# The source's bytes (used for cache keys) and its decoded image, read once.
+# Encoded sources are decoded from memory; nothing is written to disk.
+def _load(source: ImageSource) -> Tuple[bytes, Any]:
     from PIL import Image
-    PIL_AVAILABLE = True
-except ImportError:
-    PIL_AVAILABLE = False
+    if isinstance(source, Image.Image):
+        return _array_bytes(np.asarray(source)), source
+    if isinstance(source, np.ndarray):
+        return _array_bytes(source), Image.fromarray(source)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            data = f.read()
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        data = bytes(source)
+    else:
+        data = source.getvalue() if hasattr(source, "getvalue") else source.read()
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return data, image
 
-try:
-    import pytesseract
-    TESSERACT_AVAILABLE = True
-except ImportError:
-    TESSERACT_AVAILABLE = False
 
-try:
-    import easyocr
-    EASYOCR_AVAILABLE = True
-except ImportError:
-    EASYOCR_AVAILABLE = False
+def _array_bytes(array: np.ndarray) -> bytes:
+    return f"{array.shape}{array.dtype}".encode("ascii") + np.ascontiguousarray(array).tobytes()
+
+
+def _to_image(source: ImageSource):
+    from PIL import Image
+    return source if isinstance(source, Image.Image) else _load(source)[1]
+
+
+def _configured_steps() -> List[str]:
+    steps = [s.strip().lower() for s in OCR_PREPROCESS.split(",")]
+    return [s for s in PREPROCESS_STEPS if s in steps]
+
+
+# Phone cameras often write a placeholder 72 DPI; below 100 the page width
+# assumption is more reliable than the metadata.
+def _estimate_dpi(image) -> float:
+    dpi = image.info.get("dpi")
+    if dpi and dpi[0] and float(dpi[0]) >= 100:
+        return float(dpi[0])
+    return image.width / OCR_PAGE_WIDTH_IN
+
+
+def _downscale(image, dpi: float):
+    from PIL import Image
+    scale = OCR_TARGET_DPI / dpi
+    if scale >= 1.0:
+        return image
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(size, Image.LANCZOS)
+
+
+def _adaptive_threshold(gray):
+    from PIL import Image, ImageFilter
+    radius = max(8, round(OCR_TARGET_DPI / 20))
+    local_mean = np.asarray(gray.filter(ImageFilter.BoxBlur(radius)), dtype=np.int16)
+    pixels = np.asarray(gray, dtype=np.int16)
+    return Image.fromarray(np.where(pixels < local_mean - THRESHOLD_OFFSET, 0, 255).astype(np.uint8))
+
+
+# Projection-profile deskew: the rotation whose row sums of ink vary the most
+# puts text lines horizontal. Searched on a small copy, coarse then fine.
+def _skew_angle(gray) -> float:
+    from PIL import Image
+    small = gray.copy()
+    small.thumbnail((800, 800))
+    ink = Image.fromarray(255 - np.asarray(_adaptive_threshold(small)))
+    if not ink.getbbox():
+        return 0.0
+
+    # Ties (e.g. a single glyph) resolve to the smallest rotation.
+    def score(angle: float) -> Tuple[float, float]:
+        rotated = ink.rotate(angle, resample=Image.NEAREST, fillcolor=0)
+        return float(np.var(np.asarray(rotated, dtype=np.float32).sum(axis=1))), -abs(angle)
+
+    best = max(np.arange(-DESKEW_MAX_ANGLE, DESKEW_MAX_ANGLE + 0.5, 1.0), key=score)
+    best = max(np.arange(best - 1.0, best + 1.05, 0.1), key=score)
+    return float(round(best, 1))
+
+
+def _deskew(gray):
+    from PIL import Image
+    angle = _skew_angle(gray)
+    if abs(angle) < 0.1:
+        return gray
+    background = int(np.median(np.asarray(gray)))
+    return gray.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=background)
+
 
-from config import OCR_CONFIDENCE_THRESHOLD
+# Bounding box of the rows and columns that hold ink, ignoring specks of
+# noise. Found on a thumbnail, so the full-size photo is only cropped.
+def _text_box(image, margin: float = 0.01) -> Optional[Tuple[int, int, int, int]]:
+    small = image.convert("L")
+    small.thumbnail((1000, 1000))
+    ink = np.asarray(_adaptive_threshold(small)) == 0
+    rows = np.flatnonzero(ink.sum(axis=1) > max(2, ink.shape[1] // 500))
+    cols = np.flatnonzero(ink.sum(axis=0) > max(2, ink.shape[0] // 500))
+    if not len(rows) or not len(cols):
+        return None
+    scale = image.width / small.width
+    pad = max(8, margin * max(small.size))
+    return (
+        max(0, int((cols[0] - pad) * scale)),
+        max(0, int((rows[0] - pad) * scale)),
+        min(image.width, int((cols[-1] + 1 + pad) * scale)),
+        min(image.height, int((rows[-1] + 1 + pad) * scale)),
+    )
 
 
-def ocr_with_tesseract(image_path: str) -> Tuple[str, float]:
+# Prepares a photo or scan for Tesseract: EXIF rotation, then the enabled
+# OCR_PREPROCESS steps. Cropping comes first, so resizing and thresholding
+# only touch the text region, and thresholding comes before deskew, so the
+# corners a rotation adds are plain white rather than a false edge.
+def preprocess_image(image, steps: Optional[List[str]] = None):
+    from PIL import ImageOps
+    steps = _configured_steps() if steps is None else steps
+    image = ImageOps.exif_transpose(image)
+    dpi = _estimate_dpi(image)
+    if "crop" in steps:
+        box = _text_box(image)
+        if box is not None:
+            image = image.crop(box)
+    if "downscale" in steps:
+        image = _downscale(image, dpi)
+    if not any(s in steps for s in ("grayscale", "threshold", "deskew")):
+        return image
+    gray = image.convert("L")
+    if "threshold" in steps:
+        gray = _adaptive_threshold(gray)
+    if "deskew" in steps:
+        gray = _deskew(gray)
+    return gray
+
+
+def ocr_with_tesseract(image: ImageSource, steps: Optional[List[str]] = None) -> Tuple[str, float]:
     if not TESSERACT_AVAILABLE or not PIL_AVAILABLE:
         return "", 0.0
     try:
-        image = Image.open(image_path)
+        import pytesseract
+        image = preprocess_image(_to_image(image), steps)
         data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
-        words = [w for w, c in zip(data["text"], data["conf"]) if int(c) > 0 and w.strip()]
-        confs = [int(c) for c in data["conf"] if int(c) > 0]
-        text = " ".join(words)
-        avg_conf = sum(confs) / len(confs) / 100.0 if confs else 0.0
-        return text, avg_conf
+        return _tesseract_text(data)
     except Exception as e:
         return f"Tesseract error: {e}", 0.0
 
 
-def ocr_with_easyocr(image_path: str) -> Tuple[str, float]:
+def _tesseract_text(data: Dict) -> Tuple[str, float]:
+    words = [w for w, c in zip(data["text"], data["conf"]) if float(c) > 0 and w.strip()]
+    confs = [float(c) for c in data["conf"] if float(c) > 0]
+    text = " ".join(words)
+    avg_conf = sum(confs) / len(confs) / 100.0 if confs else 0.0
+    return text, avg_conf
+
+
+# One EasyOCR reader per process. Loading the detection and recognition models
+# takes seconds, so it happens once, on first use or in the startup warm-up
+# (utils/warmup.py).
+def _get_easyocr_reader():
+    global _easyocr_reader
+    if _easyocr_reader is None:
+        with _reader_lock:
+            if _easyocr_reader is None:
+                if not EASYOCR_AVAILABLE:
+                    raise ImportError("easyocr not installed. Run: pip install easyocr")
+                import easyocr
+                _easyocr_reader = easyocr.Reader(["en"], gpu=False)
+    return _easyocr_reader
+
+
+def easyocr_ready() -> bool:
+    return _easyocr_reader is not None
+
+
+def easyocr_loading() -> bool:
+    return _easyocr_reader is None and _reader_lock.locked()
+
+
+def ocr_with_easyocr(image: ImageSource) -> Tuple[str, float]:
     if not EASYOCR_AVAILABLE:
         return "", 0.0
     try:
-        reader = easyocr.Reader(["en"], gpu=False)
-        results = reader.readtext(image_path)
+        reader = _get_easyocr_reader()
+        pixels = np.asarray(_to_image(image).convert("RGB"))
+        # The reader's models are shared; concurrent sessions take turns.
+        with _read_lock:
+            results = reader.readtext(pixels)
         if not results:
             return "", 0.0
         texts = [r[1] for r in results]
@@ -53,8 +243,105 @@ def ocr_with_easyocr(image_path: str) -> Tuple[str, float]:
         return f"EasyOCR error: {e}", 0.0
 
 
-def extract_text_from_image(image_path: str) -> Tuple[str, float, bool]:
-    if not TESSERACT_AVAILABLE and not EASYOCR_AVAILABLE:
+# While the EasyOCR reader is still loading in the background, Tesseract
+# answers alone rather than waiting for it. The cache key lists the engines
+# used, so those results are not reused once EasyOCR is ready.
+def _engines() -> Dict[str, object]:
+    engines = {}
+    if TESSERACT_AVAILABLE and PIL_AVAILABLE:
+        engines["tesseract"] = ocr_with_tesseract
+    if EASYOCR_AVAILABLE and not (engines and easyocr_loading()):
+        engines["easyocr"] = ocr_with_easyocr
+    return engines
+
+
+def _run_engine(name: str, engine, image) -> Tuple[str, float]:
+    start = time.perf_counter()
+    result = engine(image)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    with _stats_lock:
+        stats = _engine_stats.setdefault(name, {"runs": 0, "wins": 0, "total_ms": 0.0})
+        stats["runs"] += 1
+        stats["total_ms"] += elapsed_ms
+    return result
+
+
+def _record_win(name: str):
+    with _stats_lock:
+        _engine_stats.setdefault(name, {"runs": 0, "wins": 0, "total_ms": 0.0})["wins"] += 1
+
+
+# Per-engine run count, mean latency and how often its text was the one returned.
+def ocr_engine_stats() -> Dict[str, Dict]:
+    with _stats_lock:
+        return {
+            name: {
+                "runs": s["runs"],
+                "wins": s["wins"],
+                "mean_ms": s["total_ms"] / s["runs"] if s["runs"] else 0.0,
+                "win_rate": s["wins"] / s["runs"] if s["runs"] else 0.0,
+            }
+            for name, s in _engine_stats.items()
+        }
+
+
+def reset_ocr_engine_stats():
+    with _stats_lock:
+        _engine_stats.clear()
+
+
+def _get_engine_pool() -> ThreadPoolExecutor:
+    global _engine_pool
+    with _stats_lock:
+        if _engine_pool is None:
+            _engine_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ocr-engine")
+    return _engine_pool
+
+
+def _extract_sequential(image) -> Tuple[str, float]:
+    engines = _engines()
+    text, conf, winner = "", 0.0, None
+    if "tesseract" in engines:
+        text, conf = _run_engine("tesseract", engines["tesseract"], image)
+        winner = "tesseract"
+    if "easyocr" in engines and (not text or conf < 0.3):
+        text2, conf2 = _run_engine("easyocr", engines["easyocr"], image)
+        if winner is None or conf2 > conf:
+            text, conf, winner = text2, conf2, "easyocr"
+    if winner is not None:
+        _record_win(winner)
+    return text, conf
+
+
+# Both engines start at once. The first result at or above the confidence
+# threshold is returned immediately; otherwise the most confident one, with
+# ties going to Tesseract. A running engine cannot be interrupted, so the
+# loser finishes on the pool and its result is dropped.
+def _extract_concurrent(image) -> Tuple[str, float]:
+    engines = _engines()
+    if not engines:
+        return "", 0.0
+    order = list(engines)
+    pool = _get_engine_pool()
+    pending = {pool.submit(_run_engine, name, engine, image): name for name, engine in engines.items()}
+    results: Dict[str, Tuple[str, float]] = {}
+    accepted = None
+    while pending and accepted is None:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in sorted(done, key=lambda f: order.index(pending[f])):
+            name = pending.pop(future)
+            results[name] = future.result()
+            if accepted is None and results[name][1] >= OCR_CONFIDENCE_THRESHOLD:
+                accepted = name
+    for future in pending:
+        future.cancel()
+    winner = accepted or max(results, key=lambda n: (results[n][1], -order.index(n)))
+    _record_win(winner)
+    return results[winner]
+
+
+def extract_text_from_image(source: ImageSource, mode: Optional[str] = None) -> Tuple[str, float, bool]:
+    if not PIL_AVAILABLE or (not TESSERACT_AVAILABLE and not EASYOCR_AVAILABLE):
         return (
             "OCR not available. Install pytesseract or easyocr, then retry. "
             "You can also type the problem manually below.",
@@ -62,11 +349,175 @@ def extract_text_from_image(image_path: str) -> Tuple[str, float, bool]:
             True,
         )
 
-    text, conf = ocr_with_tesseract(image_path)
-    if not text or conf < 0.3:
-        text2, conf2 = ocr_with_easyocr(image_path)
-        if conf2 > conf:
-            text, conf = text2, conf2
+    mode = mode or OCR_MODE
+    try:
+        data, image = _load(source)
+    except Exception as e:
+        return f"Could not read image: {e}", 0.0, True
+    cache = get_cache("ocr")
+    key = _cache_key(data, "text", mode)
+    cached = cache.get(key)
+    if cached is not None:
+        text, conf = cached
+    else:
+        if mode == "concurrent":
+            text, conf = _extract_concurrent(image)
+        else:
+            text, conf = _extract_sequential(image)
+        # Zero confidence covers engine errors, which may be transient.
+        if conf > 0:
+            cache.put(key, [text, conf])
 
     needs_hitl = conf < OCR_CONFIDENCE_THRESHOLD
-    return text, conf, needs_hitl
\ No newline at end of file
+    return text, conf, needs_hitl
+
+
+# Results depend on the image bytes and on everything that changes how they
+# are read; the confidence threshold is applied after the cache.
+def _cache_key(data: bytes, kind: str, mode: str) -> str:
+    return content_key(
+        data, kind, mode, _configured_steps(), OCR_TARGET_DPI, OCR_PAGE_WIDTH_IN, sorted(_engines()), OCR_CACHE_VERSION
+    )
+
+
+# "Q1", "Q.2", "Question 3", "4." or "5)" at the start of a paragraph begins
+# a new problem. Parenthesised labels stay with the problem above them:
+# "(a)" sub-parts and "(1)"-"(4)" MCQ options.
+PROBLEM_START = re.compile(r"^\s*(?:Q(?:uestion)?\s*\.?\s*\d{1,3}\b|\d{1,3}\s*[.)](?!\d))", re.IGNORECASE)
+REGION_MARGIN = 16
+
+
+# Tesseract paragraphs as boxes with their text, in reading order.
+def _paragraphs(image) -> List[Dict]:
+    import pytesseract
+    data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+    paragraphs: Dict[Tuple[int, int], Dict] = {}
+    for i, word in enumerate(data["text"]):
+        if float(data["conf"][i]) <= 0 or not word.strip():
+            continue
+        left, top = data["left"][i], data["top"][i]
+        right, bottom = left + data["width"][i], top + data["height"][i]
+        key = (data["block_num"][i], data["par_num"][i])
+        para = paragraphs.setdefault(key, {"words": [], "box": [left, top, right, bottom]})
+        para["words"].append(word)
+        box = para["box"]
+        box[:] = [min(box[0], left), min(box[1], top), max(box[2], right), max(box[3], bottom)]
+    ordered = sorted(paragraphs.values(), key=lambda p: (p["box"][1], p["box"][0]))
+    return [{"text": " ".join(p["words"]), "box": tuple(p["box"])} for p in ordered]
+
+
+# Groups paragraphs into problems: a numbered paragraph opens a new problem
+# and the unnumbered ones below it join it. Without any numbering the page is
+# treated as a single problem.
+def segment_problems(paragraphs: List[Dict]) -> List[Tuple[int, int, int, int]]:
+    if not any(PROBLEM_START.match(p["text"]) for p in paragraphs):
+        if not paragraphs:
+            return []
+        boxes = [p["box"] for p in paragraphs]
+        return [(min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes))]
+    regions: List[List[int]] = []
+    for para in paragraphs:
+        box = para["box"]
+        if not regions or PROBLEM_START.match(para["text"]):
+            regions.append(list(box))
+        else:
+            region = regions[-1]
+            region[:] = [min(region[0], box[0]), min(region[1], box[1]), max(region[2], box[2]), max(region[3], box[3])]
+    return [tuple(r) for r in regions]
+
+
+def _init_region_worker():
+    # Parallelism comes from the pool; one OpenMP thread per Tesseract run.
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+# Runs in a pool worker: the region is already preprocessed and holds one
+# problem, so Tesseract reads it as a single uniform block of text.
+def _recognize_region(region) -> Tuple[str, float]:
+    try:
+        import pytesseract
+        data = pytesseract.image_to_data(region, config="--psm 6", output_type=pytesseract.Output.DICT)
+        return _tesseract_text(data)
+    except Exception as e:
+        return f"Tesseract error: {e}", 0.0
+
+
+def _get_region_pool() -> ProcessPoolExecutor:
+    global _region_pool
+    with _region_pool_lock:
+        if _region_pool is None:
+            # spawn: forking a process that runs Streamlit's threads is unsafe.
+            _region_pool = ProcessPoolExecutor(
+                max_workers=OCR_WORKERS or os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_region_worker,
+            )
+    return _region_pool
+
+
+def _recognize_regions(regions: List, workers: Optional[int]) -> List[Tuple[str, float]]:
+    if workers is None:
+        workers = OCR_WORKERS or os.cpu_count() or 1
+    if len(regions) <= 1 or workers <= 1:
+        return [_recognize_region(r) for r in regions]
+    try:
+        return list(_get_region_pool().map(_recognize_region, regions))
+    except Exception:
+        # A broken pool (e.g. a worker was killed) must not lose the page.
+        return [_recognize_region(r) for r in regions]
+
+
+# Splits a worksheet photo into its numbered problems and recognizes them in
+# parallel. Layout is read from a half-resolution copy, which is enough to
+# find paragraphs and their numbering; each region is then read at full
+# resolution in a process pool. Regions Tesseract reads poorly get an
+# EasyOCR retry, as in sequential mode. Boxes are in preprocessed-page pixels.
+def extract_problems_from_image(source: ImageSource, workers: Optional[int] = None) -> List[Dict]:
+    if not TESSERACT_AVAILABLE or not PIL_AVAILABLE:
+        text, conf, needs_hitl = extract_text_from_image(source)
+        return [{"text": text, "confidence": conf, "needs_hitl": needs_hitl, "box": None}]
+
+    try:
+        data, image = _load(source)
+    except Exception as e:
+        return [{"text": f"Could not read image: {e}", "confidence": 0.0, "needs_hitl": True, "box": None}]
+    cache = get_cache("ocr")
+    key = _cache_key(data, "problems", OCR_MODE)
+    cached = cache.get(key)
+    if cached is not None:
+        return [dict(p, needs_hitl=p["confidence"] < OCR_CONFIDENCE_THRESHOLD) for p in cached]
+
+    page = preprocess_image(image)
+    factor = 2 if min(page.size) >= 1200 else 1
+    layout = page.reduce(factor) if factor > 1 else page
+    try:
+        boxes = segment_problems(_paragraphs(layout))
+    except Exception as e:
+        return [{"text": f"Tesseract error: {e}", "confidence": 0.0, "needs_hitl": True, "box": None}]
+
+    boxes = [
+        (
+            max(0, b[0] * factor - REGION_MARGIN),
+            max(0, b[1] * factor - REGION_MARGIN),
+            min(page.width, b[2] * factor + REGION_MARGIN),
+            min(page.height, b[3] * factor + REGION_MARGIN),
+        )
+        for b in boxes
+    ]
+    results = _recognize_regions([page.crop(b) for b in boxes], workers)
+
+    problems = []
+    for box, (text, conf) in zip(boxes, results):
+        if EASYOCR_AVAILABLE and (not text or conf < 0.3):
+            text2, conf2 = ocr_with_easyocr(page.crop(box))
+            if conf2 > conf:
+                text, conf = text2, conf2
+        problems.append({
+            "text": text,
+            "confidence": conf,
+            "needs_hitl": conf < OCR_CONFIDENCE_THRESHOLD,
+            "box": box,
+        })
+    if problems and all(p["confidence"] > 0 for p in problems):
+        cache.put(key, problems)
+    return problems
@@ -0,0 +1,125 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from config import OCR_WARMUP, RAG_RERANK_ENABLED, WARMUP_MODELS
+
+
+def _load_embeddings():
+    from rag.pipeline import get_embed_model
+    get_embed_model()
+
+
+def _load_reranker():
+    from rag.rerank import get_reranker
+    get_reranker().load()
+
+
+def _load_easyocr():
+    from utils.ocr import _get_easyocr_reader
+    _get_easyocr_reader()
+
+
+def _load_whisper():
+    from utils.audio import preload_whisper_model
+    preload_whisper_model()
+
+
+# name -> (sidebar label, loader, why it is off or "" when it can load).
+def _default_tasks() -> Dict[str, tuple]:
+    from rag.embeddings import ORT_AVAILABLE, ST_AVAILABLE
+    from rag.rerank import ST_AVAILABLE as RERANK_AVAILABLE
+    from utils.audio import WHISPER_AVAILABLE
+    from utils.ocr import EASYOCR_AVAILABLE
+
+    return {
+        "embeddings": ("Embeddings", _load_embeddings, "" if ST_AVAILABLE or ORT_AVAILABLE else "not installed"),
+        "ocr": ("EasyOCR", _load_easyocr, "" if EASYOCR_AVAILABLE and OCR_WARMUP else
+                "not installed" if not EASYOCR_AVAILABLE else "OCR_WARMUP=false"),
+        "asr": ("Whisper", _load_whisper, "" if WHISPER_AVAILABLE else "not installed"),
+        "reranker": ("Reranker", _load_reranker, "" if RAG_RERANK_ENABLED and RERANK_AVAILABLE else
+                     "not installed" if RAG_RERANK_ENABLED else "RAG_RERANK_ENABLED=false"),
+    }
+
+
+# Loads models on background threads at startup, one thread per model, so the
+# first request does not pay for them. Requests never wait on the manager:
+# each model module loads on demand as before and, where it has an
+# alternative, uses it while a model is still loading. The manager only
+# starts the loads early and records each model's state and load time.
+class WarmupManager:
+    def __init__(self, names: Optional[List[str]] = None, tasks: Optional[Dict[str, tuple]] = None):
+        tasks = _default_tasks() if tasks is None else tasks
+        if names is None:
+            names = [n.strip() for n in WARMUP_MODELS.split(",") if n.strip()]
+        self._tasks = {name: tasks[name] for name in names if name in tasks}
+        self._status: Dict[str, Dict] = {}
+        for name, (label, _, off_reason) in self._tasks.items():
+            self._status[name] = {
+                "label": label,
+                "state": "off" if off_reason else "waiting",
+                "seconds": None,
+                "error": off_reason,
+            }
+        self._threads: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+
+    # Registers a task that needs objects created after startup; call start()
+    # again to launch it.
+    def add(self, name: str, label: str, load: Callable[[], None], off_reason: str = ""):
+        with self._lock:
+            if name not in self._tasks:
+                self._tasks[name] = (label, load, off_reason)
+                self._status[name] = {
+                    "label": label,
+                    "state": "off" if off_reason else "waiting",
+                    "seconds": None,
+                    "error": off_reason,
+                }
+
+    def start(self):
+        with self._lock:
+            for name, (_, load, _) in self._tasks.items():
+                if self._status[name]["state"] == "waiting":
+                    self._status[name]["state"] = "loading"
+                    thread = threading.Thread(target=self._run, args=(name, load), name=f"warmup-{name}", daemon=True)
+                    self._threads[name] = thread
+                    thread.start()
+        return self
+
+    def _run(self, name: str, load: Callable[[], None]):
+        start = time.perf_counter()
+        try:
+            load()
+            state, error = "ready", ""
+        except Exception as e:
+            # The first request that needs this model retries and reports it.
+            state, error = "failed", str(e)
+        with self._lock:
+            self._status[name].update(state=state, error=error, seconds=time.perf_counter() - start)
+
+    def status(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: dict(s) for name, s in self._status.items()}
+
+    def ready(self, name: str) -> bool:
+        with self._lock:
+            return name in self._status and self._status[name]["state"] == "ready"
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in list(self._threads.values()):
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        return not any(s["state"] == "loading" for s in self.status().values())
+
+
+_manager: Optional[WarmupManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_warmup_manager() -> WarmupManager:
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = WarmupManager()
+    return _manager